@@ -9,9 +9,10 @@
   @date 2021-10-22
   @url https://github.com/DFRobot/DFRobot_Oxygen
 '''
+import math
+import statistics
 import time
 import smbus
-import os
            
 ## I2C address select
 ADDRESS_0                 = 0x70
@@ -26,24 +27,50 @@ USER_SET_REGISTER         = 0x08
 AUTUAL_SET_REGISTER       = 0x09
 ## Register for obtaining key value
 GET_KEY_REGISTER          = 0x0A
+## Delay between reading the key value and the oxygen data, in seconds
+FLASH_DELAY               = 0.1
+## Burst readings further than this many (normal-consistent) median absolute deviations from the median are rejected
+BURST_REJECTION           = 3.0
 
 class DFRobot_Oxygen(object):
-  ## oxygen key value
-  __key      = 0.0
-  ## Data value to be smoothed
-  __count    = 0
-  __txbuf      = [0]
-  __oxygendata = [0]*101
-  def __init__(self, bus):
-    self.i2cbus = smbus.SMBus(bus)
+  def __init__(self, bus, ema_time_constant=None, clock=time.monotonic):
+    '''!
+      @param bus A bus number or an already opened, SMBus-compatible handle (e.g. library.i2c_bus.I2CBus)
+      @param ema_time_constant Time constant in seconds of an exponential moving average replacing
+      @n     the collect_num window average, or None
+    '''
+    self.i2cbus = smbus.SMBus(bus) if isinstance(bus, int) else bus
+    ## oxygen key value, read once and cached until calibrate()
+    self.__key = None
+    self.__txbuf = [0]
+    ## Ring buffer of the last samples and their running sum
+    self.__oxygendata = []
+    self.__index = 0
+    self.__sum = 0.0
+    self.__collect_num = None
+    self.__ema_time_constant = ema_time_constant
+    self.__ema = None
+    self.__ema_time = None
+    self.__clock = clock
+
+  @property
+  def key(self):
+    return self.__key
 
   def get_flash(self):
+    time.sleep(self.read_key())
+
+  def read_key(self):
+    '''!
+      @brief Read the key value without waiting
+      @return Delay in seconds before the oxygen data should be read
+    '''
     rslt = self.read_reg(GET_KEY_REGISTER, 1)
     if rslt == 0:
       self.__key = (20.9 / 120.0)
     else:
       self.__key = (float(rslt[0]) / 1000.0)
-    time.sleep(0.1)
+    return FLASH_DELAY
   
   def calibrate(self, vol, mv):
     '''!
@@ -58,25 +85,115 @@ class DFRobot_Oxygen(object):
     else:
       self.__txbuf[0] = int((vol / mv) * 1000)
       self.write_reg(AUTUAL_SET_REGISTER, self.__txbuf)
+    ## The key changes with the calibration: read it again, and drop samples scaled with the old one
+    self.__key = None
+    self.reset_average()
 
   def get_oxygen_data(self, collect_num):
     '''!
       @brief Get oxygen concentration
       @param collectNum The number of data to be smoothed
       @n     For example, upload 20 and take the average value of the 20 data, then return the concentration data
+      @n     The key value is only read (and waited for) on the first call and after calibrate()
       @return Oxygen concentration, unit vol
     '''
-    self.get_flash()
-    if collect_num > 0:
-      for num in range(collect_num, 1, -1):
-        self.__oxygendata[num-1] = self.__oxygendata[num-2]
-      rslt = self.read_reg(OXYGEN_DATA_REGISTER, 3)
-      self.__oxygendata[0] = self.__key * (float(rslt[0]) + float(rslt[1]) / 10.0 + float(rslt[2]) / 100.0)
-      if self.__count < collect_num:
-        self.__count += 1
-      return self.get_average_num(self.__oxygendata, self.__count)
-    elif (collect_num > 100) or (collect_num <= 0):
+    if self.__key is None:
+      self.get_flash()
+    return self.read_oxygen_data(collect_num)
+
+  def read_oxygen_data(self, collect_num):
+    '''!
+      @brief Get oxygen concentration using the key value from a previous read_key()
+      @param collectNum The number of data to be smoothed (1 to 100); ignored with an EMA
+      @return Oxygen concentration, unit vol, or -1 if collectNum is out of range
+    '''
+    if (collect_num > 100) or (collect_num <= 0):
       return -1
+    value = self.read_oxygen_sample()
+    if self.__ema_time_constant is not None:
+      return self.__update_ema(value)
+    return self.__update_average(value, collect_num)
+
+  def read_oxygen_burst(self, count, interval=0.0, rejection=BURST_REJECTION):
+    '''!
+      @brief Take count raw readings interval seconds apart and average them with outlier rejection
+      @n     Readings further than rejection * 1.4826 * MAD from the median are dropped, but never
+      @n     readings within one register step (0.01 * key) of it. The rolling average is not updated.
+      @param count Number of readings (1 to 100)
+      @param interval Seconds between two readings
+      @return (Oxygen concentration unit vol, spread: standard deviation of the kept readings)
+    '''
+    if (count > 100) or (count <= 0):
+      raise ValueError("Invalid burst size")
+    if self.__key is None:
+      self.get_flash()
+    samples = []
+    for num in range(count):
+      if num and interval > 0:
+        time.sleep(interval)
+      samples.append(self.read_oxygen_sample())
+    return self.combine_burst(samples, rejection)
+
+  def combine_burst(self, samples, rejection=BURST_REJECTION):
+    '''!
+      @brief Average burst readings taken with read_oxygen_sample() with the outlier rejection of read_oxygen_burst()
+      @n     Lets the caller wait between the readings itself, e.g. on an event loop
+      @param samples Oxygen concentrations, unit vol
+      @param rejection Rejection threshold in MADs; math.inf keeps every reading
+      @return (Oxygen concentration unit vol, spread: standard deviation of the kept readings)
+    '''
+    kept = samples
+    if not math.isinf(rejection):
+      median = statistics.median(samples)
+      limit = max(rejection * 1.4826 * statistics.median(abs(x - median) for x in samples), self.__key * 0.01)
+      kept = [x for x in samples if abs(x - median) <= limit]
+    return (math.fsum(kept) / len(kept), statistics.pstdev(kept))
+
+  def read_oxygen_sample(self):
+    '''!
+      @brief Read one unsmoothed oxygen concentration using the cached key value
+      @return Oxygen concentration, unit vol
+    '''
+    rslt = self.read_reg(OXYGEN_DATA_REGISTER, 3)
+    return self.__key * (float(rslt[0]) + float(rslt[1]) / 10.0 + float(rslt[2]) / 100.0)
+
+  def reset_average(self):
+    self.__oxygendata = []
+    self.__index = 0
+    self.__sum = 0.0
+    self.__collect_num = None
+    self.__ema = None
+    self.__ema_time = None
+
+  def __update_average(self, value, collect_num):
+    ## O(1) per sample: overwrite the oldest slot of the ring buffer and update the running sum
+    ## A different window size restarts the average, so it never mixes samples of two windows
+    if collect_num != self.__collect_num:
+      self.reset_average()
+      self.__collect_num = collect_num
+    data = self.__oxygendata
+    if len(data) < collect_num:
+      data.append(value)
+      self.__sum += value
+    else:
+      self.__sum += value - data[self.__index]
+      data[self.__index] = value
+      self.__index = (self.__index + 1) % collect_num
+      if self.__index == 0:
+        ## Once per lap, recompute the sum so floating point error cannot accumulate
+        self.__sum = math.fsum(data)
+    return self.__sum / len(data)
+
+  def __update_ema(self, value):
+    ## Time-based EMA: the weight of a sample depends on the time since the previous one
+    now = self.__clock()
+    if self.__ema is None:
+      self.__ema = value
+    else:
+      alpha = 1.0 - math.exp(-(now - self.__ema_time) / self.__ema_time_constant)
+      self.__ema += alpha * (value - self.__ema)
+    self.__ema_time = now
+    return self.__ema
 
   def get_average_num(self, barry, Len):
     temp = 0.0
@@ -85,18 +202,15 @@ class DFRobot_Oxygen(object):
     return (temp / float(Len))
 
 class DFRobot_Oxygen_IIC(DFRobot_Oxygen): 
-  def __init__(self, bus, addr):
+  def __init__(self, bus, addr, **kwargs):
     self.__addr = addr
-    super(DFRobot_Oxygen_IIC, self).__init__(bus)
+    super(DFRobot_Oxygen_IIC, self).__init__(bus, **kwargs)
 
   def write_reg(self, reg, data):
     self.i2cbus.write_i2c_block_data(self.__addr, reg, data)
 
   def read_reg(self, reg, len):
-    while 1:
-      try:
-        rslt = self.i2cbus.read_i2c_block_data(self.__addr, reg, len)
-        return rslt
-      except:
-        os.system('i2cdetect -y 5')
-        time.sleep(1)
+    '''!
+      @brief Read len bytes from reg; errors are raised, retries and recovery are left to the bus (library.i2c_bus.I2CBus)
+    '''
+    return self.i2cbus.read_i2c_block_data(self.__addr, reg, len)
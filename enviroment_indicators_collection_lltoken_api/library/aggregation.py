@@ -0,0 +1,77 @@
+"""Windowed aggregation of fast samples into one summary reading per entity."""
+
+from .entities import Reading
+
+
+class RunningSummary:
+    """Streaming count / sum / min / max / last of one entity's samples, O(1) per sample."""
+
+    __slots__ = ("entity", "count", "total", "minimum", "maximum", "last")
+
+    def __init__(self, entity, value):
+        self.entity = entity
+        self.count = 1
+        self.total = value
+        self.minimum = value
+        self.maximum = value
+        self.last = value
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        elif value > self.maximum:
+            self.maximum = value
+        self.last = value
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+
+class WindowAggregator:
+    """
+    Collect raw sensor values between two publishes and summarise them.
+
+    add() folds a value into the entity's RunningSummary; flush() closes the
+    window and returns one Reading per entity whose state is the window mean and
+    whose summary holds min, max, last and the sample count, all rounded to the
+    entity's precision. Entities without samples in the window are left out.
+    """
+
+    def __init__(self):
+        self._window = {}
+
+    def add(self, entity, value):
+        summary = self._window.get(entity.entity_id)
+        if summary is None:
+            self._window[entity.entity_id] = RunningSummary(entity, value)
+        else:
+            summary.add(value)
+
+    def add_many(self, values):
+        """Add (entity, value) pairs."""
+        for entity, value in values:
+            self.add(entity, value)
+
+    def flush(self, timestamp):
+        """
+        Close the current window.
+
+        :param timestamp: Reading timestamp of the aggregates (end of the window)
+        :return: List of Reading with a summary dictionary
+        """
+
+        window, self._window = self._window, {}
+        readings = []
+        for summary in window.values():
+            entity = summary.entity
+            precision = entity.precision
+            readings.append(Reading(entity, round(summary.mean, precision), timestamp, {
+                "min": round(summary.minimum, precision),
+                "max": round(summary.maximum, precision),
+                "last": round(summary.last, precision),
+                "count": summary.count,
+            }))
+        return readings
@@ -1,9 +1,12 @@
 """BMP280/BME280 Driver."""
 
+import ctypes
 import struct
 import time
+from collections import namedtuple
 from i2cdevice import BitField, Device, Register, _int_to_bytes
 from i2cdevice.adapter import Adapter, LookupAdapter
+from smbus2 import SMBus, i2c_msg
 
 __version__ = "1.0.1"
 
@@ -11,6 +14,35 @@ BMP280_CHIP_ID = 0x58
 BME280_CHIP_ID = 0x60
 I2C_ADDRESS_GND = 0x76
 I2C_ADDRESS_VCC = 0x77
+DEFAULT_QNH = 1013.25  # Standard sea level pressure, hPa
+
+REG_CALIBRATION = 0x88
+REG_CTRL_MEAS = 0xF4
+REG_DATA = 0xF7  # press_msb, press_lsb, press_xlsb, temp_msb, temp_lsb, temp_xlsb
+DATA_LENGTH = 6
+# dig_T1..dig_T3, dig_P1..dig_P9: little endian, T1 and P1 unsigned
+CALIBRATION = struct.Struct("<HhhHhhhhhhhh")
+
+OVERSAMPLING_CODES = {1: 0b001, 2: 0b010, 4: 0b011, 8: 0b100, 16: 0b101}
+FILTER_CODES = {0: 0b000, 2: 0b001, 4: 0b010, 8: 0b011, 16: 0b100}  # IIR filter coefficient -> CONFIG.filter
+MODE_FORCED = 0b10
+
+# Measurement profiles after the datasheet's recommended settings (tables 4 and 7):
+# name -> (temperature oversampling, pressure oversampling, IIR filter coefficient)
+PROFILES = {
+    "ultra-low-power": (1, 1, 0),     # weather monitoring
+    "standard": (1, 4, 4),            # floor change detection
+    "high-resolution": (1, 8, 4),
+    "indoor-navigation": (2, 16, 16),
+}
+
+# One compensated measurement: temperature in °C, pressure in hPa, altitude in m for the given QNH
+BMP280Sample = namedtuple("BMP280Sample", ["temperature", "pressure", "altitude"])
+
+
+def measurement_time(temperature_oversampling, pressure_oversampling):
+    """Maximum measurement time in seconds for the oversampling factors (datasheet 3.8.1)."""
+    return (1.25 + 2.3 * temperature_oversampling + 2.3 * pressure_oversampling + 0.575) / 1000.0
 
 
 class S16Adapter(Adapter):
@@ -43,6 +75,12 @@ class BMP280Calibration:
         self.dig_p9 = 0
         self.temperature_fine = 0
 
+    def set_from_bytes(self, data):
+        """Decode the 24 byte calibration block read from 0x88."""
+        (self.dig_t1, self.dig_t2, self.dig_t3,
+         self.dig_p1, self.dig_p2, self.dig_p3, self.dig_p4, self.dig_p5,
+         self.dig_p6, self.dig_p7, self.dig_p8, self.dig_p9) = CALIBRATION.unpack(bytes(data))
+
     def set_from_namedtuple(self, value):
         for key in self.__dict__.keys():
             try:
@@ -52,32 +90,84 @@ class BMP280Calibration:
 
     def compensate_temperature(self, raw_temperature):
         var1 = (raw_temperature / 16384.0 - self.dig_t1 / 1024.0) * self.dig_t2
-        var2 = (raw_temperature / 131072.0 - self.dig_t1 / 8192.0) ** 2 * self.dig_t3
+        # Squares are products, not ** 2: libm pow() may be off in the last bit, x * x is
+        # correctly rounded and matches NumPy (see compensate_batch)
+        var2 = raw_temperature / 131072.0 - self.dig_t1 / 8192.0
+        var2 = var2 * var2 * self.dig_t3
         self.temperature_fine = var1 + var2
         return self.temperature_fine / 5120.0
 
     def compensate_pressure(self, raw_pressure):
         var1 = self.temperature_fine / 2.0 - 64000.0
-        var2 = var1 ** 2 * self.dig_p6 / 32768.0
+        var2 = var1 * var1 * self.dig_p6 / 32768.0
         var2 += var1 * self.dig_p5 * 2
         var2 = var2 / 4.0 + self.dig_p4 * 65536.0
-        var1 = (self.dig_p3 * var1 ** 2 / 524288.0 + self.dig_p2 * var1) / 524288.0
+        var1 = (self.dig_p3 * (var1 * var1) / 524288.0 + self.dig_p2 * var1) / 524288.0
         var1 = (1.0 + var1 / 32768.0) * self.dig_p1
         if var1 == 0:
             return 0  # Avoid division by zero
         pressure = 1048576.0 - raw_pressure
         pressure = (pressure - var2 / 4096.0) * 6250.0 / var1
-        var1 = self.dig_p9 * pressure ** 2 / 2147483648.0
+        var1 = self.dig_p9 * (pressure * pressure) / 2147483648.0
         var2 = pressure * self.dig_p8 / 32768.0
         return pressure + (var1 + var2 + self.dig_p7) / 16.0
 
+    def compensate_batch(self, raw_temperature, raw_pressure):
+        """
+        Compensate arrays of raw samples in one vectorized pass.
+
+        Performs exactly the floating point operations of compensate_temperature()
+        and compensate_pressure(), in the same order, so every element is
+        bit-identical to the scalar result. temperature_fine is not changed.
+        Requires NumPy.
+
+        :param raw_temperature: Array-like of 20 bit raw temperatures
+        :param raw_pressure: Array-like of 20 bit raw pressures, same length
+        :return: (temperature in °C, pressure in Pa) as float64 arrays
+        """
+
+        import numpy as np
+
+        raw_temperature = np.asarray(raw_temperature, dtype=np.float64)
+        raw_pressure = np.asarray(raw_pressure, dtype=np.float64)
+
+        var1 = (raw_temperature / 16384.0 - self.dig_t1 / 1024.0) * self.dig_t2
+        var2 = raw_temperature / 131072.0 - self.dig_t1 / 8192.0
+        var2 = var2 * var2 * self.dig_t3
+        temperature_fine = var1 + var2
+        temperature = temperature_fine / 5120.0
+
+        var1 = temperature_fine / 2.0 - 64000.0
+        var2 = var1 * var1 * self.dig_p6 / 32768.0
+        var2 += var1 * self.dig_p5 * 2
+        var2 = var2 / 4.0 + self.dig_p4 * 65536.0
+        var1 = (self.dig_p3 * (var1 * var1) / 524288.0 + self.dig_p2 * var1) / 524288.0
+        var1 = (1.0 + var1 / 32768.0) * self.dig_p1
+        valid = var1 != 0  # Avoid division by zero, like the scalar path
+        pressure = 1048576.0 - raw_pressure
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pressure = (pressure - var2 / 4096.0) * 6250.0 / var1
+            var1 = self.dig_p9 * (pressure * pressure) / 2147483648.0
+            var2 = pressure * self.dig_p8 / 32768.0
+            pressure = pressure + (var1 + var2 + self.dig_p7) / 16.0
+        return temperature, np.where(valid, pressure, 0.0)
+
 
 class BMP280:
-    def __init__(self, i2c_addr=I2C_ADDRESS_GND, i2c_dev=None):
+    def __init__(self, i2c_addr=I2C_ADDRESS_GND, i2c_dev=None, qnh=DEFAULT_QNH):
         self.calibration = BMP280Calibration()
+        self.qnh = qnh
         self._is_setup = False
         self._i2c_addr = i2c_addr
-        self._i2c_dev = i2c_dev
+        # The DATA and CALIBRATION registers are read directly from the bus, so open the
+        # same default bus i2cdevice would when no device is given
+        self._i2c_dev = i2c_dev if i2c_dev is not None else SMBus(1)
+        # DATA is read with one write/read transfer into a byte array allocated once
+        self._data = (ctypes.c_uint8 * DATA_LENGTH)()
+        self._data_messages = (i2c_msg.write(i2c_addr, [REG_DATA]), i2c_msg.read(i2c_addr, DATA_LENGTH))
+        self._data_messages[1].buf = ctypes.cast(self._data, ctypes.POINTER(ctypes.c_char))
+        self._ctrl_meas_forced = None
+        self.measurement_time = 0.0
         self._bmp280 = Device([I2C_ADDRESS_GND, I2C_ADDRESS_VCC], i2c_dev=self._i2c_dev, bit_width=8, registers=(
             Register("CHIP_ID", 0xD0, fields=(BitField("id", 0xFF),)),
             Register("RESET", 0xE0, fields=(BitField("reset", 0xFF),)),
@@ -140,9 +230,23 @@ class BMP280:
             ), bit_width=192)
         ))
 
-    def setup(self, mode="normal", temperature_oversampling=16, pressure_oversampling=16, temperature_standby=500):
+    def setup(self, mode="normal", temperature_oversampling=16, pressure_oversampling=16, temperature_standby=500,
+              iir_filter=4, profile=None):
+        """
+        Configure the sensor once.
+
+        :param mode: "normal" (continuous, standby between measurements) or "forced" (one measurement per read)
+        :param iir_filter: IIR filter coefficient: 0 (off), 2, 4, 8 or 16
+        :param profile: Name of one of PROFILES; overrides the oversampling and filter arguments
+        :raises ValueError: If the profile is unknown
+        """
+
         if self._is_setup:
             return
+        if profile is not None:
+            if profile not in PROFILES:
+                raise ValueError(f"Invalid BMP280 profile: {profile}")
+            temperature_oversampling, pressure_oversampling, iir_filter = PROFILES[profile]
         self._is_setup = True
 
         self._bmp280.select_address(self._i2c_addr)
@@ -159,18 +263,88 @@ class BMP280:
             raise RuntimeError(f"Unable to find BMP280/BME280 on 0x{self._i2c_addr:02x}, IOError")
 
         self._bmp280.set("CTRL_MEAS", mode=mode, osrs_t=temperature_oversampling, osrs_p=pressure_oversampling)
-        self._bmp280.set("CONFIG", t_sb=temperature_standby, filter=2)
-        self.calibration.set_from_namedtuple(self._bmp280.get("CALIBRATION"))
+        self._bmp280.set("CONFIG", t_sb=temperature_standby, filter=FILTER_CODES[iir_filter])
+        self._ctrl_meas_forced = (OVERSAMPLING_CODES[temperature_oversampling] << 5
+                                  | OVERSAMPLING_CODES[pressure_oversampling] << 2 | MODE_FORCED)
+        self.measurement_time = measurement_time(temperature_oversampling, pressure_oversampling)
+        self.calibration.set_from_bytes(
+            self._i2c_dev.read_i2c_block_data(self._i2c_addr, REG_CALIBRATION, CALIBRATION.size)
+        )
 
     def update_sensor(self):
+        time.sleep(self.start_measurement())
+        self._update()
+
+    def start_measurement(self):
+        """
+        In forced mode, start one measurement without waiting for it.
+
+        Writes CTRL_MEAS once; instead of polling STATUS the caller waits for the
+        returned datasheet maximum measurement time, then calls read_measurement().
+
+        :return: Seconds until the result can be read (0 in normal mode)
+        """
+
         self.setup()
-        if self._mode == "forced":
-            self._bmp280.set("CTRL_MEAS", mode="forced")
-            while self._bmp280.get("STATUS").measuring:
-                time.sleep(0.001)
-        raw = self._bmp280.get("DATA")
-        self.temperature = self.calibration.compensate_temperature(raw.temperature)
-        self.pressure = self.calibration.compensate_pressure(raw.pressure) / 100.0
+        if self._mode != "forced":
+            return 0.0
+        self._i2c_dev.write_byte_data(self._i2c_addr, REG_CTRL_MEAS, self._ctrl_meas_forced)
+        return self.measurement_time
+
+    def read_measurement(self, qnh=None):
+        """
+        Read the latest result (see start_measurement()) from a single DATA burst.
+
+        :param qnh: Sea level pressure in hPa for the altitude, defaults to self.qnh
+        :return: BMP280Sample
+        """
+
+        self.setup()
+        self._update()
+        altitude = self.altitude(self.pressure, self.temperature, self.qnh if qnh is None else qnh)
+        return BMP280Sample(self.temperature, self.pressure, altitude)
+
+    def _update(self):
+        raw_temperature, raw_pressure = self._read_raw()
+        self.temperature = self.calibration.compensate_temperature(raw_temperature)
+        self.pressure = self.calibration.compensate_pressure(raw_pressure) / 100.0
+
+    def _read_raw(self):
+        """
+        Read DATA (0xF7..0xFC) with one transfer and decode the 20 bit raw values.
+
+        Bypasses the i2cdevice register objects, which decode a namedtuple
+        through bit masks on every sample, and reads with i2c_rdwr() into the
+        preallocated message buffer instead of a new list per block read.
+
+        :return: (raw_temperature, raw_pressure)
+        """
+
+        self._i2c_dev.i2c_rdwr(*self._data_messages)
+        data = self._data
+        return ((data[3] << 12) | (data[4] << 4) | (data[5] >> 4),
+                (data[0] << 12) | (data[1] << 4) | (data[2] >> 4))
+
+    def read_all(self, qnh=None):
+        """
+        Read temperature, pressure and altitude from a single DATA burst.
+
+        The 6 data bytes are read once and compensated once (temperature first,
+        since pressure compensation depends on it); the getters below each do a
+        full read of their own. In forced mode a measurement is started first
+        and waited for.
+
+        :param qnh: Sea level pressure in hPa for the altitude, defaults to self.qnh
+        :return: BMP280Sample
+        """
+
+        time.sleep(self.start_measurement())
+        return self.read_measurement(qnh)
+
+    @staticmethod
+    def altitude(pressure, temperature, qnh=DEFAULT_QNH):
+        """Altitude in m of a pressure in hPa at a temperature in °C, for the sea level pressure qnh in hPa."""
+        return ((pow((qnh / pressure), (1.0 / 5.257)) - 1) * (temperature + 273.15)) / 0.0065
 
     def get_temperature(self):
         self.update_sensor()
@@ -180,10 +354,8 @@ class BMP280:
         self.update_sensor()
         return self.pressure
 
-    def get_altitude(self, qnh=1013.25, manual_temperature=None):
+    def get_altitude(self, qnh=DEFAULT_QNH, manual_temperature=None):
         self.update_sensor()
-        pressure = self.get_pressure()
-        temperature = manual_temperature if manual_temperature else self.get_temperature()
-        altitude = ((pow((qnh / pressure), (1.0 / 5.257)) - 1) * (temperature + 273.15)) / 0.0065
-        return altitude
+        temperature = manual_temperature if manual_temperature else self.temperature
+        return self.altitude(self.pressure, temperature, qnh)
 
@@ -0,0 +1,129 @@
+"""Circuit breaker guarding calls to Home Assistant."""
+
+import functools
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 10.0
+DEFAULT_MAX_RESET_TIMEOUT = 300.0
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a dead endpoint while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    While closed every call goes through; failure_threshold consecutive failures
+    open the breaker. While open, calls fail immediately with CircuitOpenError
+    for the current backoff, which starts at reset_timeout, doubles each time a
+    probe fails up to max_reset_timeout, and is jittered to between half and all
+    of that value. Once the backoff has elapsed the breaker turns half-open and
+    lets exactly one probe call through: its success closes the breaker, its
+    failure opens it again. Calls arriving while the probe is in flight are
+    rejected.
+
+    is_failure(error) decides whether an exception counts against the endpoint;
+    exceptions for which it returns False are re-raised but count as a response.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 max_reset_timeout=DEFAULT_MAX_RESET_TIMEOUT, is_failure=None, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self._is_failure = is_failure or (lambda error: True)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.rejected_count = 0
+        self.transitions = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+        self._backoff = reset_timeout
+        self._retry_at = 0.0
+
+    def allow(self):
+        """Return True if a call may go to the endpoint now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() >= self._retry_at:
+                self._transition(HALF_OPEN)
+                return True
+            self.rejected_count += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._backoff = self.reset_timeout
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._backoff = min(self._backoff * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func through the breaker.
+
+        :raises CircuitOpenError: If the breaker is open or a probe is already in flight
+        """
+
+        if not self.allow():
+            raise CircuitOpenError(f"Home Assistant unavailable, circuit {self.state}")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self._is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def wrap(self, func):
+        """Return func guarded by this breaker."""
+        @functools.wraps(func)
+        def guarded(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return guarded
+
+    def _open(self):
+        self._retry_at = self._clock() + self._backoff / 2 + random.uniform(0, self._backoff / 2)
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        self.state = state
+        self.transitions[state] += 1
+        if state == OPEN:
+            print(f"Circuit breaker open, retrying Home Assistant in {self._retry_at - self._clock():.1f} s")
+        else:
+            print(f"Circuit breaker {state.replace('_', '-')}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected_count,
+                "opened": self.transitions[OPEN],
+                "half_opened": self.transitions[HALF_OPEN],
+                "closed": self.transitions[CLOSED],
+            }
@@ -0,0 +1,86 @@
+"""Declarative entity registry compiled once at startup."""
+
+import json
+import math
+from collections import namedtuple
+
+_STATE_PLACEHOLDER = "__state__"
+# State posted for the entities of a sensor that stopped answering
+UNAVAILABLE = "unavailable"
+
+Reading = namedtuple("Reading", ["entity", "state", "timestamp", "summary"], defaults=(None,))
+SensorBinding = namedtuple("SensorBinding", ["name", "measurement", "entities"])
+
+
+class Entity(namedtuple("Entity", ["entity_id", "object_id", "url", "headers", "attributes", "deadband",
+                                   "precision", "prefix", "suffix"])):
+    """
+    Immutable description of one Home Assistant sensor entity.
+
+    Everything that does not depend on the measured value (URL, headers, the
+    attributes and the JSON payload around the state) is built once by
+    compile_entity(); encode() only splices the state into the pre-encoded
+    byte template.
+    """
+
+    __slots__ = ()
+
+    def encode(self, state, summary=None):
+        """Return the JSON request body for state as bytes, with summary merged into the attributes."""
+        if summary:
+            # suffix ends with the closing braces of attributes and of the payload
+            extra = json.dumps(summary, separators=(",", ":"))[1:-1].encode("utf-8")
+            return self.prefix + _encode_state(state) + self.suffix[:-2] + b"," + extra + b"}}"
+        return self.prefix + _encode_state(state) + self.suffix
+
+    def payload(self, state, summary=None):
+        """Return the state payload as a dictionary (attributes are shared, do not modify)."""
+        if summary:
+            return {"state": state, "attributes": {**self.attributes, **summary}}
+        return {"state": state, "attributes": self.attributes}
+
+
+def compile_entity(base_url, object_id, unit, friendly_name, headers=None, deadband=0.0, precision=2):
+    """
+    Build the descriptor for sensor.<object_id>; unit None leaves out unit_of_measurement.
+
+    :param base_url: States endpoint the entity id is appended to
+    :param headers: Header set sent with every update of this entity
+    :param deadband: Default absolute change threshold used by the change filter
+    :param precision: Number of decimals the state is rounded to
+    """
+
+    entity_id = f"sensor.{object_id}"
+    attributes = {"friendly_name": friendly_name}
+    if unit is not None:
+        attributes = {"unit_of_measurement": unit, **attributes}
+    template = json.dumps({"state": _STATE_PLACEHOLDER, "attributes": attributes},
+                          ensure_ascii=False, separators=(",", ":"))
+    prefix, suffix = template.split(json.dumps(_STATE_PLACEHOLDER))
+    return Entity(entity_id.lower(), object_id, f"{base_url}/{entity_id}", headers, attributes, deadband,
+                  precision, prefix.encode("utf-8"), suffix.encode("utf-8"))
+
+
+def compile_registry(options, definitions, measurements, base_url, headers=None):
+    """
+    Compile the entities of every sensor enabled in options.
+
+    :param options: Add-on options (options.json)
+    :param definitions: {sensor option: ((object_id, unit, friendly_name, deadband), ...)}
+    :param measurements: {sensor option: library.measurement.Measurement whose collect() returns one value per entity}
+    :return: Tuple of SensorBinding for the enabled sensors, in definition order
+    """
+
+    return tuple(
+        SensorBinding(name, measurements[name], tuple(
+            compile_entity(base_url, object_id, unit, friendly_name, headers, deadband)
+            for object_id, unit, friendly_name, deadband in entities
+        ))
+        for name, entities in definitions.items() if options.get(name, False)
+    )
+
+
+def _encode_state(state):
+    if type(state) is float and math.isfinite(state):
+        return repr(state).encode("ascii")
+    return json.dumps(state).encode("utf-8")
@@ -0,0 +1,196 @@
+"""MQTT transport publishing Home Assistant discovery configs and compact per-device states."""
+
+import asyncio
+import json
+import threading
+import time
+import paho.mqtt.client as mqtt
+from .async_publisher import PublishResult
+from .entities import UNAVAILABLE
+
+DEFAULT_PORT = 1883
+DEFAULT_QOS = 1
+DEFAULT_MAX_INFLIGHT = 20
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_NODE_ID = "enviroment"
+DEFAULT_DISCOVERY_PREFIX = "homeassistant"
+BASE_TOPIC = "enviroment"
+
+DEVICE_CLASSES = {
+    "temperature": "temperature",
+    "dew_point": "temperature",
+    "humidity": "humidity",
+    "absolute_humidity": "absolute_humidity",
+    "pressure": "atmospheric_pressure",
+    "altitude": "distance",
+}
+
+
+class HAMqttError(ConnectionError):
+    """Raised when a state could not be handed to the MQTT broker."""
+
+
+class HAMqttTransport:
+    """
+    Publish sensor states to an MQTT broker using Home Assistant MQTT discovery.
+
+    Entities are split into a device and a field by their object id
+    (sensor.sht45_temperature -> device "sht45", field "temperature"). The first
+    time an entity is seen its discovery config is published, retained, under
+    <discovery_prefix>/sensor/<node_id>/<object_id>/config; the configs are
+    re-sent whenever Home Assistant announces itself on <discovery_prefix>/status.
+    States are published, retained, as one compact JSON object per device on
+    enviroment/<node_id>/<device>/state, so a cycle costs one message per device
+    instead of one request per entity; window aggregates add a <field>_summary
+    object that becomes the entity's attributes. At most max_inflight QoS>0 messages are
+    unacknowledged at any time.
+
+    publish(readings) has the same contract as AsyncPublisher.publish, and
+    post_reading/post_state the same as their HATransport counterparts.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, username=None, password=None, node_id=DEFAULT_NODE_ID,
+                 qos=DEFAULT_QOS, max_inflight=DEFAULT_MAX_INFLIGHT, timeout=DEFAULT_TIMEOUT,
+                 discovery_prefix=DEFAULT_DISCOVERY_PREFIX, client=None):
+        self.node_id = node_id
+        self.qos = qos
+        self.timeout = timeout
+        self.discovery_prefix = discovery_prefix
+        self.availability_topic = f"{BASE_TOPIC}/{node_id}/status"
+        self._configs = {}
+        self._device_states = {}
+        self._lock = threading.Lock()
+
+        self._client = client or mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"{node_id}-sensors")
+        if username:
+            self._client.username_pw_set(username, password)
+        self._client.max_inflight_messages_set(max_inflight)
+        self._client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self._client.will_set(self.availability_topic, "offline", qos=1, retain=True)
+        self._client.on_connect = self._on_connect
+        self._client.on_message = self._on_message
+        self._client.connect_async(host, port, keepalive=60)
+        self._client.loop_start()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code != 0:
+            print(f"MQTT connection refused: {reason_code}")
+            return
+        print("Connected to MQTT broker")
+        client.publish(self.availability_topic, "online", qos=1, retain=True)
+        client.subscribe(f"{self.discovery_prefix}/status", qos=1)
+        self._announce_all()
+
+    def _on_message(self, client, userdata, message):
+        # Home Assistant birth message: discovery configs have to be sent again
+        if message.payload == b"online":
+            self._announce_all()
+
+    def _announce_all(self):
+        with self._lock:
+            configs = list(self._configs.items())
+        for topic, config in configs:
+            self._client.publish(topic, config, qos=1, retain=True)
+
+    def _announce(self, object_id, device, field, attributes):
+        topic = f"{self.discovery_prefix}/sensor/{self.node_id}/{object_id}/config"
+        if topic in self._configs:
+            return
+        config = {
+            "name": attributes.get("friendly_name", object_id),
+            "unique_id": f"{self.node_id}_{object_id}",
+            "default_entity_id": f"sensor.{object_id}",
+            "state_topic": self.state_topic(device),
+            "value_template": f"{{{{ value_json.{field} }}}}",
+            "json_attributes_topic": self.state_topic(device),
+            "json_attributes_template": f"{{{{ value_json.{field}_summary | default({{}}) | tojson }}}}",
+            "availability_topic": self.availability_topic,
+            "device": {"identifiers": [f"{self.node_id}_{device}"], "name": device.upper()},
+        }
+        if "unit_of_measurement" in attributes:
+            config["unit_of_measurement"] = attributes["unit_of_measurement"]
+            config["state_class"] = "measurement"
+        if field in DEVICE_CLASSES:
+            config["device_class"] = DEVICE_CLASSES[field]
+        payload = json.dumps(config, separators=(",", ":"))
+        with self._lock:
+            self._configs[topic] = payload
+        self._client.publish(topic, payload, qos=1, retain=True)
+
+    def state_topic(self, device):
+        return f"{BASE_TOPIC}/{self.node_id}/{device}/state"
+
+    def publish(self, readings):
+        """
+        Publish a batch of library.entities.Reading, one message per device.
+
+        :return: List of PublishResult in the same order as readings
+        """
+
+        entries = [(reading.entity.object_id, reading.entity.attributes, reading.state, reading.summary)
+                   for reading in readings]
+        return [PublishResult(reading, latency, error)
+                for reading, (latency, error) in zip(readings, self._publish_states(entries))]
+
+    async def publish_batch(self, readings):
+        """Coroutine version of publish(); waits for the broker on the loop's default executor."""
+        if not readings:
+            return []
+        return await asyncio.get_running_loop().run_in_executor(None, self.publish, readings)
+
+    def post_reading(self, reading):
+        """Publish a single Reading; raises HAMqttError on failure."""
+        return self.post_state(reading.entity.url, reading.entity.payload(reading.state))
+
+    def post_state(self, url, payload):
+        """Publish a single entity state; raises HAMqttError on failure."""
+        object_id = url.rsplit("/", 1)[-1].split(".", 1)[-1]
+        latency, error = self._publish_states([(object_id, payload.get("attributes", {}), payload["state"], None)])[0]
+        if error is not None:
+            raise error
+        return latency
+
+    def _publish_states(self, entries):
+        start = time.monotonic()
+        devices = {}
+        for index, (object_id, attributes, state, summary) in enumerate(entries):
+            object_id = object_id.lower()
+            device, _, field = object_id.partition("_")
+            field = field or "state"
+            self._announce(object_id, device, field, attributes)
+            devices.setdefault(device, []).append((index, field, state, summary))
+
+        if not self._client.is_connected():
+            return [(0.0, HAMqttError("Not connected to MQTT broker"))] * len(entries)
+
+        in_flight = []
+        for device, fields in devices.items():
+            with self._lock:
+                state = self._device_states.setdefault(device, {})
+                for _, field, value, summary in fields:
+                    # null makes Home Assistant show the sensor as unknown instead of a non-numeric state
+                    state[field] = None if value == UNAVAILABLE else value
+                    if summary:
+                        state[f"{field}_summary"] = summary
+                message = json.dumps(state, separators=(",", ":"))
+            in_flight.append((fields, self._client.publish(self.state_topic(device), message, qos=self.qos, retain=True)))
+
+        results = [None] * len(entries)
+        deadline = start + self.timeout
+        for fields, info in in_flight:
+            error = None
+            try:
+                info.wait_for_publish(max(0.0, deadline - time.monotonic()))
+                if not info.is_published():
+                    error = HAMqttError("Timed out waiting for MQTT broker")
+            except (RuntimeError, ValueError) as e:
+                error = HAMqttError(str(e))
+            latency = time.monotonic() - start
+            for index, *_ in fields:
+                results[index] = (latency, error)
+        return results
+
+    def close(self):
+        self._client.publish(self.availability_topic, "offline", qos=1, retain=True)
+        self._client.disconnect()
+        self._client.loop_stop()
@@ -0,0 +1,109 @@
+"""Pooled keep-alive HTTP transport for the Home Assistant REST API."""
+
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 5.0
+
+
+class HATransport:
+    """
+    Shared HTTP client used by SensorManager to push entity states.
+
+    All requests go through one requests.Session, so the TCP (and TLS) connection
+    to Home Assistant is reused across entities and cycles instead of being
+    re-established for every POST. The connection pool is bounded by pool_size and
+    every request carries a (connect, read) timeout. post_state may be called from
+    several threads at once.
+    """
+
+    def __init__(self, headers, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self._session = requests.Session()
+        self._session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self.request_count = 0
+        self.error_count = 0
+        self.last_latency = None
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._stats_lock = threading.Lock()
+
+    def post_state(self, url, payload):
+        """
+        POST a state payload to url.
+
+        :param url: Full entity URL, e.g. <base_url>/sensor.sht45_temperature
+        :param payload: JSON-serialisable state dictionary
+        :return: Request latency in seconds
+        :raises requests.exceptions.RequestException: On connection, timeout or HTTP errors
+        """
+
+        return self._post(url, json=payload)
+
+    def post_reading(self, reading):
+        """POST a library.entities.Reading using its entity's pre-encoded template."""
+        entity = reading.entity
+        return self._post(entity.url, data=entity.encode(reading.state, reading.summary), headers=entity.headers)
+
+    def _post(self, url, **kwargs):
+        start = time.monotonic()
+        try:
+            response = self._session.post(url, timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            with self._stats_lock:
+                self.error_count += 1
+            raise
+        finally:
+            latency = time.monotonic() - start
+            self._record(latency)
+        return latency
+
+    def get_states(self, url):
+        """
+        Fetch all entity states in one request (GET /api/states).
+
+        :param url: The states endpoint, e.g. http://homeassistant.local:8123/api/states
+        :return: List of state dictionaries
+        :raises requests.exceptions.RequestException: On connection, timeout or HTTP errors
+        """
+
+        return self.get_json(url)
+
+    def get_json(self, url):
+        """GET url and decode the JSON response body."""
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _record(self, latency):
+        with self._stats_lock:
+            self.request_count += 1
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._total_latency += latency
+
+    @property
+    def mean_latency(self):
+        if self.request_count == 0:
+            return None
+        return self._total_latency / self.request_count
+
+    def close(self):
+        self._session.close()
+
+
+def is_endpoint_failure(error):
+    """False for errors Home Assistant answered with a 4xx, i.e. the endpoint itself is up."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is None or status >= 500
@@ -0,0 +1,296 @@
+"""Shared, lock-arbitrated access to I2C buses."""
+
+import errno
+import threading
+import time
+from smbus2 import SMBus
+
+I2C_M_RD = 0x0001  # read flag of an i2c_msg (linux/i2c.h)
+NACK_ERRNOS = (errno.ENXIO, errno.EREMOTEIO)  # errors of a transfer the device did not acknowledge
+
+
+class RecoveryPolicy:
+    """
+    How an I2CBus recovers from failed transfers (all times in seconds).
+
+    A transfer failing with OSError is retried up to retries times, waiting
+    backoff, 2 * backoff, ... (at most max_backoff) between attempts without
+    holding the bus lock. A device whose transfers failed degrade_after times
+    in a row (after their retries) is degraded: its transfers are no longer
+    retried and callers should skip it until probe() succeeds. Probes are due
+    probe_interval after degradation, then back off exponentially up to
+    max_probe_interval. After reopen_after failed attempts in a row on the
+    whole bus, the bus file descriptor is closed and opened again.
+    """
+
+    def __init__(self, retries=2, backoff=0.005, max_backoff=0.1, degrade_after=3,
+                 probe_interval=1.0, max_probe_interval=60.0, reopen_after=10):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.degrade_after = degrade_after
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.reopen_after = reopen_after
+
+    def retry_delay(self, attempt):
+        return min(self.backoff * 2 ** attempt, self.max_backoff)
+
+    def probe_delay(self, failed_probes):
+        return min(self.probe_interval * 2 ** failed_probes, self.max_probe_interval)
+
+
+class DeviceStats:
+    """Transfer statistics and health of one device address (latencies in seconds)."""
+
+    __slots__ = ("name", "transfers", "errors", "bytes_written", "bytes_read", "total_latency", "max_latency",
+                 "retries", "consecutive_failures", "degraded", "failed_probes", "next_probe", "recoveries")
+
+    def __init__(self, name):
+        self.name = name
+        self.transfers = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.retries = 0
+        self.consecutive_failures = 0
+        self.degraded = False
+        self.failed_probes = 0
+        self.next_probe = None
+        self.recoveries = 0
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.transfers if self.transfers else None
+
+    def as_dict(self):
+        return {
+            "transfers": self.transfers,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "bytes_read": self.bytes_read,
+            "mean_latency": self.mean_latency,
+            "max_latency": self.max_latency,
+            "retries": self.retries,
+            "degraded": self.degraded,
+            "recoveries": self.recoveries,
+        }
+
+
+class I2CBus:
+    """
+    Thread-safe handle to one opened I2C bus.
+
+    Offers the subset of the smbus2.SMBus API used by the drivers in this
+    add-on; every call holds the bus lock for the duration of the transfer and
+    is accounted to the device address (transfers, errors, bytes, latency).
+    The lock is released between the attempts of a retried transfer.
+
+    Failed transfers are retried, devices degraded and the bus reopened as
+    described by the RecoveryPolicy; reopening uses opener(bus_number), which
+    defaults to SMBus unless an smbus handle is passed in.
+    """
+
+    def __init__(self, bus_number, smbus=None, policy=None, opener=None, clock=time.monotonic, sleep=time.sleep):
+        self.bus_number = bus_number
+        self._opener = opener if opener is not None or smbus is not None else SMBus
+        self._smbus = smbus if smbus is not None else self._opener(bus_number)
+        self.policy = policy if policy is not None else RecoveryPolicy()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.RLock()
+        self._devices = {}
+        self._bus_failures = 0
+        self.reopens = 0
+
+    def label(self, address, name):
+        """Name the device at address in the statistics."""
+        self._device(address).name = name
+
+    def write_byte(self, address, value):
+        return self._transfer(address, 1, 0, "write_byte", address, value)
+
+    def read_byte(self, address):
+        return self._transfer(address, 0, 1, "read_byte", address)
+
+    def write_byte_data(self, address, register, value):
+        return self._transfer(address, 2, 0, "write_byte_data", address, register, value)
+
+    def read_byte_data(self, address, register):
+        return self._transfer(address, 1, 1, "read_byte_data", address, register)
+
+    def write_word_data(self, address, register, value):
+        return self._transfer(address, 3, 0, "write_word_data", address, register, value)
+
+    def read_word_data(self, address, register):
+        return self._transfer(address, 1, 2, "read_word_data", address, register)
+
+    def write_i2c_block_data(self, address, register, data):
+        return self._transfer(address, 1 + len(data), 0, "write_i2c_block_data", address, register, data)
+
+    def read_i2c_block_data(self, address, register, length):
+        return self._transfer(address, 1, length, "read_i2c_block_data", address, register, length)
+
+    def i2c_rdwr(self, *messages):
+        written = sum(message.len for message in messages if not message.flags & I2C_M_RD)
+        read = sum(message.len for message in messages if message.flags & I2C_M_RD)
+        return self._transfer(messages[0].addr, written, read, "i2c_rdwr", *messages)
+
+    def poll(self, *messages):
+        """
+        i2c_rdwr() for a device that NACKs while it has no new data (e.g. an SHT3x fetch in periodic mode).
+
+        :return: True when the messages were transferred; False when the device NACKed, which is
+                 neither retried nor counted as a failure
+        """
+
+        written = sum(message.len for message in messages if not message.flags & I2C_M_RD)
+        read = sum(message.len for message in messages if message.flags & I2C_M_RD)
+        return self._transfer(messages[0].addr, written, read, "i2c_rdwr", *messages, poll=True) is not False
+
+    def _transfer(self, address, written, read, method, *args, poll=False):
+        device = self._device(address)
+        attempt = 0
+        while True:
+            with self._lock:
+                start = time.monotonic()
+                try:
+                    result = getattr(self._smbus, method)(*args)
+                except OSError as e:
+                    if poll and e.errno in NACK_ERRNOS:
+                        return False
+                    device.errors += 1
+                    self._bus_failures += 1
+                    if self._opener is not None and self._bus_failures >= self.policy.reopen_after:
+                        self._reopen()
+                    if device.degraded or attempt >= self.policy.retries:
+                        self._failed(device)
+                        raise
+                except Exception:
+                    device.errors += 1
+                    raise
+                else:
+                    device.bytes_written += written
+                    device.bytes_read += read
+                    device.consecutive_failures = 0
+                    self._bus_failures = 0
+                    return result
+                finally:
+                    latency = time.monotonic() - start
+                    device.transfers += 1
+                    device.total_latency += latency
+                    device.max_latency = max(device.max_latency, latency)
+            # Back off without the lock, so the other devices keep the bus
+            self._sleep(self.policy.retry_delay(attempt))
+            attempt += 1
+            device.retries += 1
+
+    def _failed(self, device):
+        device.consecutive_failures += 1
+        if not device.degraded and device.consecutive_failures >= self.policy.degrade_after:
+            device.degraded = True
+            device.failed_probes = 0
+            device.next_probe = self._clock() + self.policy.probe_delay(0)
+            print(f"I2C bus {self.bus_number}: {device.name} degraded after "
+                  f"{device.consecutive_failures} failed transfers")
+
+    def _reopen(self):
+        self._bus_failures = 0
+        try:
+            self._smbus.close()
+        except OSError:
+            pass
+        try:
+            self._smbus = self._opener(self.bus_number)
+            self.reopens += 1
+            print(f"I2C bus {self.bus_number}: reopened")
+        except OSError as e:
+            print(f"I2C bus {self.bus_number}: reopen failed: {e}")
+
+    def is_degraded(self, address):
+        device = self._devices.get(address)
+        return device is not None and device.degraded
+
+    def available(self, address):
+        """
+        False while the device is degraded, except when its probe is due and succeeds.
+        Blocking (the probe is a bus transfer); cheap when the device is not degraded.
+        """
+        device = self._devices.get(address)
+        if device is None or not device.degraded:
+            return True
+        if self._clock() < device.next_probe:
+            return False
+        return self.probe(address)
+
+    def probe(self, address):
+        """Address the device with an SMBus quick write; clears its degraded state when it acknowledges."""
+        device = self._device(address)
+        with self._lock:
+            try:
+                self._smbus.write_quick(address)
+            except OSError:
+                if device.degraded:
+                    device.failed_probes += 1
+                    device.next_probe = self._clock() + self.policy.probe_delay(device.failed_probes)
+                return False
+            if device.degraded:
+                device.degraded = False
+                device.recoveries += 1
+                print(f"I2C bus {self.bus_number}: {device.name} recovered after {device.failed_probes + 1} probe(s)")
+            device.consecutive_failures = 0
+            return True
+
+    def _device(self, address):
+        device = self._devices.get(address)
+        if device is None:
+            device = self._devices.setdefault(address, DeviceStats(f"0x{address:02x}"))
+        return device
+
+    def stats(self):
+        return {device.name: device.as_dict() for device in list(self._devices.values())}
+
+    def format_stats(self):
+        return f"I2C bus {self.bus_number}: " + "; ".join(
+            f"{device.name} {device.transfers} transfers, {device.errors} errors, "
+            f"{device.bytes_written}/{device.bytes_read} bytes written/read, "
+            f"latency {_ms(device.mean_latency)} (max {_ms(device.max_latency)}), {device.retries} retries"
+            + (", degraded" if device.degraded else "")
+            for device in list(self._devices.values())
+        ) + (f"; reopened {self.reopens} times" if self.reopens else "")
+
+    def close(self):
+        with self._lock:
+            self._smbus.close()
+
+
+class I2CBusManager:
+    """Owns at most one I2CBus (one file descriptor) per bus number, all using the same RecoveryPolicy."""
+
+    def __init__(self, policy=None):
+        self._buses = {}
+        self._lock = threading.Lock()
+        self.policy = policy
+
+    def get(self, bus_number):
+        with self._lock:
+            bus = self._buses.get(bus_number)
+            if bus is None:
+                bus = self._buses[bus_number] = I2CBus(bus_number, policy=self.policy)
+            return bus
+
+    @property
+    def buses(self):
+        return tuple(self._buses.values())
+
+    def close(self):
+        with self._lock:
+            for bus in self._buses.values():
+                bus.close()
+            self._buses.clear()
+
+
+def _ms(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.2f} ms"
@@ -0,0 +1,59 @@
+"""
+Trigger/convert/collect measurements for devices sharing an I2C bus.
+
+Every sensor is its own library.scheduler.DeadlineScheduler task and awaits its
+conversion on the event loop, so sensors due at the same deadline are all
+triggered first and then collected in the order their conversions finish: a
+cycle costs about the longest conversion instead of the sum of all of them.
+"""
+
+import asyncio
+from collections import namedtuple
+from functools import partial
+
+# trigger() sends the measurement command (None for devices converting continuously),
+# conversion_time is the datasheet worst case in seconds from the end of trigger() until
+# the result is readable, and collect() reads the result and returns the values.
+# A burst calls collect() samples times, sample_interval seconds apart, and combine(results)
+# returns the values.
+Measurement = namedtuple("Measurement", ["name", "trigger", "collect", "conversion_time",
+                                         "samples", "sample_interval", "combine"], defaults=(1, 0.0, None))
+
+
+class MeasurementTimeout(TimeoutError):
+    """Raised by the call() of measure_async() when a bus call did not finish in time."""
+
+
+async def measure_async(measurement, call=None):
+    """
+    Run one measurement on the running event loop.
+
+    trigger() and collect() are blocking bus calls and run through the coroutine
+    function call(func) (on the loop's default executor when None); the conversion
+    time and the waits of a burst are awaited with asyncio.sleep, so they hold no
+    thread and other measurements and the publisher run in the meantime.
+
+    :return: The values returned by collect() (or combine()), or None on failure
+    :raises MeasurementTimeout: If call() gave up on a bus call
+    """
+
+    if call is None:
+        call = partial(asyncio.get_running_loop().run_in_executor, None)
+    try:
+        if measurement.trigger is not None:
+            await call(measurement.trigger)
+        if measurement.conversion_time > 0:
+            await asyncio.sleep(measurement.conversion_time)
+        if measurement.samples == 1:
+            return await call(measurement.collect)
+        results = []
+        for index in range(measurement.samples):
+            if index and measurement.sample_interval > 0:
+                await asyncio.sleep(measurement.sample_interval)
+            results.append(await call(measurement.collect))
+        return measurement.combine(results)
+    except MeasurementTimeout:
+        raise
+    except Exception as e:
+        print(f"Error reading {measurement.name.upper()}: {e}")
+        return None
@@ -0,0 +1,296 @@
+"""Durable store-and-forward outbox for readings Home Assistant did not acknowledge."""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULT_DIRECTORY = "/data/outbox"
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+DEFAULT_MAX_SEGMENTS = 32
+DEFAULT_FSYNC_BATCH = 32
+DEFAULT_FSYNC_INTERVAL = 5.0
+DEFAULT_DRAIN_RATE = 5.0
+DEFAULT_RETRY_INTERVAL = 10.0
+DEFAULT_DRAIN_BATCH = 20
+
+
+class Outbox:
+    """
+    Append-only, bounded segment log of {"url", "payload", "ts"} records.
+
+    Records are appended as JSON lines to numbered segment files; a segment is
+    rotated once it reaches segment_size bytes and the oldest segment is discarded
+    when more than max_segments exist, so the log never grows beyond roughly
+    segment_size * max_segments on the SD card. Writes are flushed immediately but
+    fsync'd in batches (every fsync_batch records or fsync_interval seconds). The
+    read position is kept in a cursor file, so pending records survive container
+    restarts; delivery is at-least-once.
+    """
+
+    SEGMENT_SUFFIX = ".log"
+    CURSOR_FILE = "cursor.json"
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, segment_size=DEFAULT_SEGMENT_SIZE, max_segments=DEFAULT_MAX_SEGMENTS,
+                 fsync_batch=DEFAULT_FSYNC_BATCH, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(2, max_segments)
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.dropped_count = 0
+        self._lock = threading.RLock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(
+            int(name[:-len(self.SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+            if name.endswith(self.SEGMENT_SUFFIX) and name[:-len(self.SEGMENT_SUFFIX)].isdigit()
+        )
+        self._cursor = self._load_cursor()
+        if not self._segments:
+            self._segments = [self._cursor[0]]
+        if self._cursor[0] not in self._segments:
+            self._cursor = (self._segments[0], 0)
+        self._repair_tail()
+        self._file = open(self._segment_path(self._segments[-1]), "ab")
+        self._pending = self._count_pending()
+
+    @property
+    def pending(self):
+        """Number of records not yet acknowledged."""
+        return self._pending
+
+    def append(self, record):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file.tell() > 0 and self._file.tell() + len(line) > self.segment_size:
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            self._unsynced += 1
+            self.sync_if_due()
+
+    def peek(self, limit):
+        """
+        Return up to limit of the oldest pending records without removing them.
+
+        :return: List of (position, record) tuples in append order; record is None for a
+                 corrupt line. Pass the last position to ack() once the batch is delivered.
+        """
+
+        records = []
+        with self._lock:
+            segment, offset = self._cursor
+            index = self._segments.index(segment)
+            while len(records) < limit:
+                with open(self._segment_path(segment), "rb") as file:
+                    file.seek(offset)
+                    for line in file:
+                        if not line.endswith(b"\n"):
+                            break
+                        offset += len(line)
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            record = None
+                        records.append(((segment, offset), record))
+                        if len(records) >= limit:
+                            break
+                if len(records) >= limit or index + 1 >= len(self._segments):
+                    break
+                index += 1
+                segment, offset = self._segments[index], 0
+        return records
+
+    def ack(self, position, count):
+        """Mark every record up to and including position as delivered."""
+        with self._lock:
+            # While the batch was being posted, a full outbox may have dropped the segments it was read from:
+            # those records are already counted as dropped and the cursor has moved past them
+            if position[0] < self._segments[0] or position <= self._cursor:
+                return
+            self._pending = max(0, self._pending - min(count, self._count_between(self._cursor, position)))
+            self._cursor = position
+            if self._pending == 0:
+                self._reset()
+            else:
+                while self._segments[0] < position[0]:
+                    os.remove(self._segment_path(self._segments.pop(0)))
+            self._save_cursor()
+
+    def sync_if_due(self):
+        with self._lock:
+            if self._unsynced and (self._unsynced >= self.fsync_batch
+                                   or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self.sync()
+
+    def sync(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self.sync()
+            self._file.close()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"{segment:08d}{self.SEGMENT_SUFFIX}")
+
+    def _rotate(self):
+        self.sync()
+        self._file.close()
+        self._segments.append(self._segments[-1] + 1)
+        self._file = open(self._segment_path(self._segments[-1]), "ab")
+        while len(self._segments) > self.max_segments:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        segment = self._segments.pop(0)
+        offset = self._cursor[1] if self._cursor[0] == segment else 0
+        dropped = self._count_lines(segment, offset)
+        os.remove(self._segment_path(segment))
+        self._pending = max(0, self._pending - dropped)
+        self.dropped_count += dropped
+        if self._cursor[0] == segment:
+            self._cursor = (self._segments[0], 0)
+            self._save_cursor()
+        print(f"Outbox full: dropped {dropped} oldest readings")
+
+    def _reset(self):
+        # Everything delivered: drop the old segments and start a fresh one
+        self._file.close()
+        for segment in self._segments:
+            os.remove(self._segment_path(segment))
+        self._segments = [self._segments[-1] + 1]
+        self._file = open(self._segment_path(self._segments[-1]), "ab")
+        self._cursor = (self._segments[0], 0)
+        self._unsynced = 0
+
+    def _repair_tail(self):
+        # Cut off a half-written record left by a power loss
+        path = self._segment_path(self._segments[-1])
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as file:
+            data = file.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                file.truncate(end)
+
+    def _count_lines(self, segment, offset=0, end=None):
+        path = self._segment_path(segment)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as file:
+            file.seek(offset)
+            return file.read(-1 if end is None else end - offset).count(b"\n")
+
+    def _count_between(self, start, end):
+        # Records after position start up to and including position end
+        return sum(
+            self._count_lines(segment, start[1] if segment == start[0] else 0, end[1] if segment == end[0] else None)
+            for segment in self._segments if start[0] <= segment <= end[0]
+        )
+
+    def _count_pending(self):
+        segment, offset = self._cursor
+        return sum(self._count_lines(s, offset if s == segment else 0) for s in self._segments if s >= segment)
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, self.CURSOR_FILE), "r") as file:
+                cursor = json.load(file)
+            return int(cursor["segment"]), int(cursor["offset"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return 0, 0
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, self.CURSOR_FILE)
+        with open(path + ".tmp", "w") as file:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, file)
+        os.replace(path + ".tmp", path)
+
+
+class OutboxDrainer(threading.Thread):
+    """
+    Background thread replaying outbox records in order once Home Assistant is back.
+
+    Records are posted one at a time through post(url, payload), at most `rate`
+    records per second, so catching up after an outage does not flood HA. The
+    original reading time is attached as a `measured_at` attribute. On a
+    connection failure the drainer waits retry_interval seconds and retries the same
+    record; records rejected with a 4xx response are skipped.
+    """
+
+    def __init__(self, outbox, post, rate=DEFAULT_DRAIN_RATE, retry_interval=DEFAULT_RETRY_INTERVAL,
+                 batch_size=DEFAULT_DRAIN_BATCH):
+        super().__init__(name="outbox-drainer", daemon=True)
+        self.outbox = outbox
+        self._post = post
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self.replayed_count = 0
+        self.rejected_count = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._drain_once()
+            except Exception as e:
+                # Never let the thread die: new readings would then queue in the outbox forever
+                print(f"Outbox drainer error: {e}")
+                self._stop_event.wait(self.retry_interval)
+
+    def _drain_once(self):
+        self.outbox.sync_if_due()
+        batch = self.outbox.peek(self.batch_size)
+        if not batch:
+            self._stop_event.wait(1.0)
+            return
+        delivered, position = self._drain(batch)
+        if delivered:
+            self.outbox.ack(position, delivered)
+            print(f"Outbox: replayed {delivered} readings, {self.outbox.pending} pending")
+        if delivered < len(batch):
+            self._stop_event.wait(self.retry_interval)
+
+    def _drain(self, batch):
+        delivered = 0
+        position = None
+        for record_position, record in batch:
+            if record is not None:
+                try:
+                    self._post(record["url"], replay_payload(record))
+                    self.replayed_count += 1
+                except Exception as e:
+                    status = getattr(getattr(e, "response", None), "status_code", None)
+                    if status is None or not 400 <= status < 500:
+                        print(f"Outbox replay paused: {e}")
+                        break
+                    self.rejected_count += 1
+                    print(f"Outbox: dropping reading rejected by Home Assistant: {e}")
+            position = record_position
+            delivered += 1
+            if record is not None and self._stop_event.wait(self._interval):
+                break
+        return delivered, position
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def replay_payload(record):
+    payload = dict(record["payload"])
+    attributes = dict(payload.get("attributes", {}))
+    attributes["measured_at"] = datetime.fromtimestamp(record["ts"], timezone.utc).isoformat()
+    payload["attributes"] = attributes
+    return payload
@@ -0,0 +1,169 @@
+"""Bounded ring buffer decoupling sensor sampling from publishing."""
+
+import asyncio
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_CAPACITY = 64
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+OVERFLOW_POLICIES = (DROP_OLDEST, COALESCE)
+
+Sample = namedtuple("Sample", ["key", "item", "timestamp"])
+
+
+class SampleBuffer:
+    """
+    Fixed-capacity, thread-safe FIFO of timestamped samples.
+
+    The sampling side puts samples, the publisher takes them in batches.
+    When the buffer is full the overflow policy decides what is lost:
+
+    - "drop_oldest": the oldest queued sample is discarded.
+    - "coalesce": if a sample for the same key (entity) is still queued it is
+      replaced in place by the newer one; otherwise the oldest sample is discarded.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, policy=DROP_OLDEST):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self._slots = [None] * capacity
+        self._head = 0
+        self._count = 0
+        self._latest = {}
+        self._not_empty = threading.Condition(threading.Lock())
+
+    @property
+    def depth(self):
+        return self._count
+
+    def put(self, key, item, timestamp=None):
+        self.put_many([(key, item)], timestamp)
+
+    def put_many(self, items, timestamp=None):
+        """
+        Queue several (key, item) pairs at once, e.g. all entities of one cycle.
+
+        The publisher is woken only once, so it sees the whole cycle as one batch.
+        """
+
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._not_empty:
+            for key, item in items:
+                self._put(Sample(key, item, timestamp))
+            self._not_empty.notify()
+
+    def _put(self, sample):
+        if self._count == self.capacity:
+            slot = self._latest.get(sample.key) if self.policy == COALESCE else None
+            if slot is not None:
+                self._slots[slot] = sample
+                self.coalesced_count += 1
+                return
+            self._pop()
+            self.dropped_count += 1
+        slot = (self._head + self._count) % self.capacity
+        self._slots[slot] = sample
+        self._latest[sample.key] = slot
+        self._count += 1
+
+    def _pop(self):
+        sample = self._slots[self._head]
+        self._slots[self._head] = None
+        if self._latest.get(sample.key) == self._head:
+            del self._latest[sample.key]
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        return sample
+
+    def get_batch(self, max_items=None, timeout=None):
+        """
+        Take up to max_items of the oldest samples, waiting up to timeout seconds for one.
+
+        :return: List of Sample, oldest first; empty if the timeout expired
+        """
+
+        with self._not_empty:
+            if not self._count:
+                self._not_empty.wait(timeout)
+            count = self._count if max_items is None else min(max_items, self._count)
+            return [self._pop() for _ in range(count)]
+
+
+class PublishStats:
+    """Queue and lag statistics of a publisher consuming a SampleBuffer."""
+
+    def __init__(self, buffer, max_batch=None, stats_interval=60.0):
+        self.buffer = buffer
+        self.max_batch = max_batch
+        self.stats_interval = stats_interval
+        self.published_count = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+
+    def _record(self, batch):
+        self.published_count += len(batch)
+        self.last_lag = time.time() - batch[0].timestamp
+        self.max_lag = max(self.max_lag, self.last_lag)
+
+    def stats(self):
+        return {
+            "queue_depth": self.buffer.depth,
+            "queue_capacity": self.buffer.capacity,
+            "dropped": self.buffer.dropped_count,
+            "coalesced": self.buffer.coalesced_count,
+            "published": self.published_count,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        last_lag = "n/a" if stats["last_lag"] is None else f"{stats['last_lag'] * 1000:.0f} ms"
+        return (f"Publisher: depth {stats['queue_depth']}/{stats['queue_capacity']}, dropped {stats['dropped']}, "
+                f"coalesced {stats['coalesced']}, lag {last_lag} (max {stats['max_lag'] * 1000:.0f} ms)")
+
+
+class AsyncPublishWorker(PublishStats):
+    """
+    Publisher task consuming a SampleBuffer on the sampling event loop.
+
+    Each batch of queued items is handed to the coroutine function publish(items).
+    End-to-end lag is the time from sampling to the end of the publish call for
+    the oldest sample of a batch; exceptions from publish are logged so the task
+    never dies. No thread blocks on the buffer: whoever puts samples calls
+    notify() (from the loop's thread) to wake run().
+    """
+
+    def __init__(self, buffer, publish, max_batch=None, stats_interval=60.0):
+        super().__init__(buffer, max_batch, stats_interval)
+        self._publish = publish
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def run(self):
+        last_report = time.monotonic()
+        while True:
+            batch = self.buffer.get_batch(self.max_batch, timeout=0)
+            if batch:
+                try:
+                    await self._publish([sample.item for sample in batch])
+                except Exception as e:
+                    print(f"Error publishing batch: {e}")
+                self._record(batch)
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            if time.monotonic() - last_report >= self.stats_interval:
+                last_report = time.monotonic()
+                print(self.format_stats())
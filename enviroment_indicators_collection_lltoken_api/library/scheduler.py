@@ -0,0 +1,191 @@
+"""Drift-free periodic scheduler driven by monotonic deadlines."""
+
+import asyncio
+import inspect
+import math
+import threading
+import time
+
+DEFAULT_STATS_INTERVAL = 60.0
+
+
+class Job:
+    """One periodic job and its timing statistics (all times in seconds)."""
+
+    __slots__ = ("name", "interval", "callback", "phase", "ready", "deadline", "runs", "missed", "skipped",
+                 "overruns", "errors", "last_jitter", "max_jitter", "total_jitter", "last_duration", "max_duration")
+
+    def __init__(self, name, interval, callback, phase, ready=None):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.phase = phase
+        self.ready = ready
+        self.deadline = None
+        self.runs = 0
+        self.missed = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.errors = 0
+        self.last_jitter = None
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+        self.last_duration = None
+        self.max_duration = 0.0
+
+    @property
+    def mean_jitter(self):
+        return self.total_jitter / self.runs if self.runs else None
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "mean_jitter": self.mean_jitter,
+            "max_jitter": self.max_jitter,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+        }
+
+
+class DeadlineScheduler:
+    """
+    Run periodic jobs at monotonic deadlines on the running event loop.
+
+    A job added with interval and phase first runs phase seconds after start
+    and then at start + phase + k * interval: the next deadline is computed from
+    the previous deadline, not from when the job finished, so read and publish
+    time does not accumulate as drift. Jitter is how late a job started after
+    its deadline; a run taking longer than its interval is an overrun. When a
+    job is so late that whole periods have passed, those periods are counted as
+    missed and skipped rather than run back to back. A job with a ready()
+    callable is skipped (and counted as such) at every deadline where ready()
+    returns false, e.g. while its device is degraded.
+
+    run_async() runs every job as its own task, sleeping until that job's next
+    deadline, and a callback may be a coroutine function, so a job waiting on
+    I/O or a conversion delay does not hold back the others. stop() cancels the
+    tasks and makes run_async() return, e.g. from a signal handler at shutdown.
+    """
+
+    def __init__(self, clock=time.monotonic, stats_interval=DEFAULT_STATS_INTERVAL):
+        self._clock = clock
+        self.stats_interval = stats_interval
+        self._jobs = []
+        self._stop_event = threading.Event()
+        self._loop = None
+        self._stopped = None
+
+    def add(self, name, interval, callback, phase=0.0, ready=None):
+        """
+        Schedule callback() every interval seconds, the first time phase seconds after start.
+        ready() (which may return an awaitable) is checked before every run.
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval of {name} must be positive")
+        job = Job(name, interval, callback, phase, ready)
+        self._jobs.append(job)
+        return job
+
+    @property
+    def jobs(self):
+        return tuple(self._jobs)
+
+    async def run_async(self):
+        """Run every job as a task on the running event loop until stop() is called."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self._stop_event.is_set():
+            return
+        start = self._clock()
+        tasks = [asyncio.create_task(self._job_task(job, start), name=job.name) for job in self._jobs]
+        if self.stats_interval:
+            tasks.append(asyncio.create_task(self._report_task(start), name="scheduler-stats"))
+        try:
+            await self._stopped.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _job_task(self, job, start):
+        job.deadline = start + job.phase
+        while True:
+            delay = job.deadline - self._clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = self._clock()
+            try:
+                ready = True if job.ready is None else job.ready()
+                if inspect.isawaitable(ready):
+                    ready = await ready
+                if not ready:
+                    self._skip_job(job)
+                    continue
+                result = job.callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                job.errors += 1
+                print(f"Error in scheduled job {job.name}: {e}")
+            self._finish_job(job, started)
+
+    async def _report_task(self, start):
+        next_report = start + self.stats_interval
+        while True:
+            await asyncio.sleep(max(0.0, next_report - self._clock()))
+            next_report += self.stats_interval
+            print(self.format_stats())
+
+    def _skip_job(self, job):
+        job.skipped += 1
+        job.deadline += job.interval
+        finished = self._clock()
+        if finished > job.deadline:
+            job.deadline += math.ceil((finished - job.deadline) / job.interval) * job.interval
+
+    def _finish_job(self, job, started):
+        jitter = started - job.deadline
+        finished = self._clock()
+        duration = finished - started
+
+        job.runs += 1
+        job.last_jitter = jitter
+        job.max_jitter = max(job.max_jitter, jitter)
+        job.total_jitter += jitter
+        job.last_duration = duration
+        job.max_duration = max(job.max_duration, duration)
+        if duration > job.interval:
+            job.overruns += 1
+
+        job.deadline += job.interval
+        if finished > job.deadline:
+            missed = math.ceil((finished - job.deadline) / job.interval)
+            job.missed += missed
+            job.deadline += missed * job.interval
+            print(f"Scheduler: {job.name} missed {missed} deadline(s)")
+
+    def stats(self):
+        return {job.name: job.stats() for job in self._jobs}
+
+    def format_stats(self):
+        return "Scheduler: " + "; ".join(
+            f"{job.name} every {job.interval:g} s, {job.runs} runs, missed {job.missed}, skipped {job.skipped}, "
+            f"overruns {job.overruns}, jitter {_ms(job.mean_jitter)} (max {_ms(job.max_jitter)}), "
+            f"duration max {_ms(job.max_duration)}"
+            for job in self._jobs
+        )
+
+    def stop(self):
+        """Stop run_async(); safe to call from any thread."""
+        self._stop_event.set()
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+
+def _ms(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f} ms"
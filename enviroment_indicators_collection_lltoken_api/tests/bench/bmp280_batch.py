@@ -0,0 +1,48 @@
+"""
+Throughput of BMP280 compensation: the scalar compensate_temperature()/compensate_pressure() per sample
+vs. BMP280Calibration.compensate_batch() on NumPy arrays, with the datasheet calibration.
+
+Bit-identity of the two is checked by tests/test_bmp280.py; this only checks the first and last sample.
+
+    python tests/bench/bmp280_batch.py [samples]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from library.bmp280_driver import BMP280Calibration  # noqa: E402
+from test_bmp280 import CALIBRATION  # noqa: E402
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    calibration = BMP280Calibration()
+    calibration.set_from_bytes(CALIBRATION)
+    raw_temperature = np.random.default_rng(1).integers(400000, 600000, samples)
+    raw_pressure = np.random.default_rng(2).integers(300000, 500000, samples)
+    temperatures, pressures = raw_temperature.tolist(), raw_pressure.tolist()
+
+    start = time.perf_counter()
+    scalar = [(calibration.compensate_temperature(temperature), calibration.compensate_pressure(pressure))
+              for temperature, pressure in zip(temperatures, pressures)]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = calibration.compensate_batch(raw_temperature, raw_pressure)
+    batch_time = time.perf_counter() - start
+
+    for index in (0, -1):
+        assert scalar[index] == (batch[0][index], batch[1][index])
+    print(f"scalar {samples / scalar_time / 1e6:5.2f} M samples/s, "
+          f"compensate_batch {samples / batch_time / 1e6:5.1f} M samples/s ({scalar_time / batch_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
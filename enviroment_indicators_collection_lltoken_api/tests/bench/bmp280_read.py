@@ -0,0 +1,70 @@
+"""
+CPU time per BMP280 sample: the i2cdevice DATA register (namedtuple and bit masks per read) vs. the
+single i2c_rdwr() transfer of BMP280.read_measurement().
+
+Both go through a real smbus2.SMBus; only its ioctl() is replaced by one answering with the datasheet
+example of tests/test_bmp280.py, so the numbers are the Python work per sample without the bus
+transfer itself. Best of 5 runs; they depend on the interpreter and CPU, so run it on the target
+board (e.g. a Raspberry Pi) for figures that apply there.
+
+    python tests/bench/bmp280_read.py [samples]
+"""
+
+import ctypes
+import os
+import platform
+import sys
+import time
+
+import smbus2.smbus2 as smbus2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from library.bmp280_driver import BMP280  # noqa: E402
+from test_bmp280 import FakeBMP280Bus  # noqa: E402
+
+DEVICE = FakeBMP280Bus()
+
+
+def ioctl(fd, request, arg):
+    """The kernel side of I2C_SMBUS block reads and I2C_RDWR register reads; writes are ignored."""
+    if request == smbus2.I2C_SMBUS and arg.read_write == smbus2.I2C_SMBUS_READ:
+        block = arg.data.contents.block
+        for index, byte in enumerate(DEVICE._block(arg.command, arg.data.contents.byte)):
+            block[index + 1] = byte
+    elif request == smbus2.I2C_RDWR and arg.nmsgs == 2:
+        write, read = arg.msgs[0], arg.msgs[1]
+        data = bytes(DEVICE._block(write.buf[0][0], read.len))
+        ctypes.memmove(read.buf, data, len(data))
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    smbus2.ioctl = ioctl
+    bus = smbus2.SMBus()
+    bus.fd = -1
+    bmp280 = BMP280(i2c_dev=bus)
+    bmp280.setup(mode="normal")
+
+    def register():
+        raw = bmp280._bmp280.get("DATA")
+        temperature = bmp280.calibration.compensate_temperature(raw.temperature)
+        pressure = bmp280.calibration.compensate_pressure(raw.pressure) / 100.0
+        return temperature, pressure, bmp280.altitude(pressure, temperature, bmp280.qnh)
+
+    assert register() == tuple(bmp280.read_measurement())
+    print(f"{platform.machine()}, Python {platform.python_version()}")
+    for name, read in (("i2cdevice DATA", register), ("read_measurement()", bmp280.read_measurement)):
+        best = float("inf")
+        for _ in range(5):
+            start = time.process_time()
+            for _ in range(samples):
+                read()
+            best = min(best, time.process_time() - start)
+        print(f"{name:18s} {best / samples * 1e6:5.2f} us CPU per sample")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Cost of building the URL and JSON body of 13 entity states per cycle: per-cycle f-string and json.dumps
+(what run.py did before the registry) vs. the templates compiled once by library.entities.compile_entity.
+
+Reports the best time per cycle and the peak memory traced while building one cycle.
+
+    python tests/bench/entity_encode.py
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from library.entities import compile_entity  # noqa: E402
+
+BASE_URL = "http://homeassistant:8123/api/states"
+DEFINITIONS = [(f"sensor{index}_temperature", "°C", f"Sensor {index} Temperature") for index in range(13)]
+STATE = 23.46
+NUMBER = 20000
+
+
+def per_cycle():
+    requests = []
+    for object_id, unit, friendly_name in DEFINITIONS:
+        url = f"{BASE_URL}/sensor.{object_id}"
+        payload = {"state": STATE, "attributes": {"unit_of_measurement": unit, "friendly_name": friendly_name}}
+        requests.append((url, json.dumps(payload).encode("utf-8")))
+    return requests
+
+
+ENTITIES = [compile_entity(BASE_URL, object_id, unit, friendly_name) for object_id, unit, friendly_name in DEFINITIONS]
+
+
+def compiled():
+    return [(entity.url, entity.encode(STATE)) for entity in ENTITIES]
+
+
+def main():
+    for build in (per_cycle, compiled):
+        seconds = min(timeit.repeat(build, number=NUMBER, repeat=5)) / NUMBER
+        tracemalloc.start()
+        build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{build.__name__:9s} {seconds * 1e6:6.1f} us per cycle, peak {peak} B")
+
+
+if __name__ == "__main__":
+    main()
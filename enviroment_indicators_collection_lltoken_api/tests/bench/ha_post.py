@@ -0,0 +1,79 @@
+"""
+Cost of one publish cycle of 13 entity states: a new connection per POST vs. the pooled HATransport.
+
+Posts to a keep-alive HTTP server on the loopback interface standing in for Home Assistant, so the
+numbers are the client-side connection and request overhead only; over a real network (and TLS)
+the difference per new connection is larger.
+
+    python tests/bench/ha_post.py [cycles]
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from library.ha_transport import HATransport  # noqa: E402
+
+ENTITIES = 13
+HEADERS = {"Authorization": "Bearer benchmark", "Content-Type": "application/json"}
+
+
+class StubHomeAssistant(BaseHTTPRequestHandler):
+    """Answers every POST /api/states/<entity_id> like Home Assistant, keeping the connection open."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"state": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHomeAssistant)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api/states"
+    items = [(f"{base_url}/sensor.benchmark_{index}",
+              {"state": 23.46, "attributes": {"unit_of_measurement": "°C", "friendly_name": f"Benchmark {index}"}})
+             for index in range(ENTITIES)]
+
+    def unpooled():
+        for url, payload in items:
+            requests.post(url, json=payload, headers=HEADERS).raise_for_status()
+
+    transport = HATransport(HEADERS)
+
+    def pooled():
+        for url, payload in items:
+            transport.post_state(url, payload)
+
+    for name, cycle in (("requests.post", unpooled), ("HATransport", pooled)):
+        cycle()
+        start = time.perf_counter()
+        for _ in range(cycles):
+            cycle()
+        print(f"{name:14s} {(time.perf_counter() - start) / cycles * 1000:6.2f} ms per cycle of {ENTITIES} POSTs")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
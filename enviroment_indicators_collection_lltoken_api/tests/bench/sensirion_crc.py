@@ -0,0 +1,69 @@
+"""
+CPU time of the Sensirion CRC-8 and of reading one CRC-checked frame: the bitwise CRC and per-read
+i2c_msg/list of the former SHT3x/SHT4x drivers vs. the table-driven crc8() and FrameReader.
+
+The bus copies a fixed frame into the message, so the numbers leave out the I2C transfer itself.
+
+    python tests/bench/sensirion_crc.py
+"""
+
+import ctypes
+import os
+import sys
+import timeit
+
+from smbus2 import i2c_msg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from library.sensirion_common import FrameReader, crc8  # noqa: E402
+
+NUMBER = 200000
+ADDRESS = 0x44
+# 0x6666 and 0x8000, each followed by its CRC-8
+FRAME = bytes([0x66, 0x66, 0x93, 0x80, 0x00, 0xA2])
+
+
+def crc8_bitwise(data):
+    # The CRC of the former drivers, eight shifts per byte
+    crc = 0xFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x80:
+                crc = (crc << 1) ^ 0x31
+            else:
+                crc <<= 1
+    return crc & 0xFF
+
+
+class FrameBus:
+    def i2c_rdwr(self, message):
+        ctypes.memmove(message.buf, FRAME, len(FRAME))
+
+
+def read_frame_former(bus):
+    # The former _read_data_with_crc(): a new i2c_msg and list per read, bitwise CRC over slices
+    read = i2c_msg.read(ADDRESS, 6)
+    bus.i2c_rdwr(read)
+    data = list(read)
+    if crc8_bitwise(data[0:2]) == data[2] and crc8_bitwise(data[3:5]) == data[5]:
+        return [data[0] << 8 | data[1], data[3] << 8 | data[4]]
+    raise ValueError("CRC8 check failed")
+
+
+def main():
+    bus = FrameBus()
+    reader = FrameReader(ADDRESS)
+    assert crc8(b"\xbe\xef") == crc8_bitwise(b"\xbe\xef") == 0x92
+    assert tuple(read_frame_former(bus)) == reader.read(bus) == (0x6666, 0x8000)
+    for name, run in (("bitwise CRC-8, 2 bytes", lambda: crc8_bitwise(b"\xbe\xef")),
+                      ("crc8(), 2 bytes", lambda: crc8(b"\xbe\xef")),
+                      ("former frame read", lambda: read_frame_former(bus)),
+                      ("FrameReader.read()", lambda: reader.read(bus))):
+        seconds = min(timeit.repeat(run, number=NUMBER, repeat=5)) / NUMBER
+        print(f"{name:22s} {seconds * 1e6:5.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import random
+import struct
+
+import pytest
+
+from library.bmp280_driver import BMP280, BMP280Calibration
+
+# Datasheet compensation example (BMP280 section 8.2): calibration words and raw values
+CALIBRATION = struct.pack("<HhhHhhhhhhhh", 27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+RAW_TEMPERATURE = 519888
+RAW_PRESSURE = 415148
+
+
+class FakeBMP280Bus:
+    """SMBus stand-in answering with the datasheet example; counts the transactions."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.registers = {0xD0: [0x58], 0xF3: [0], 0xF4: [0], 0xF5: [0]}
+
+    def _data(self):
+        pressure, temperature = RAW_PRESSURE << 4, RAW_TEMPERATURE << 4
+        return [(pressure >> 16) & 0xFF, (pressure >> 8) & 0xFF, pressure & 0xFF,
+                (temperature >> 16) & 0xFF, (temperature >> 8) & 0xFF, temperature & 0xFF]
+
+    def _block(self, register, length):
+        if register == 0x88:
+            return list(CALIBRATION[:length])
+        if register == 0xF7:
+            return self._data()[:length]
+        return (self.registers.get(register, [0]) * length)[:length]
+
+    def read_i2c_block_data(self, address, register, length):
+        self.reads += 1
+        return self._block(register, length)
+
+    def i2c_rdwr(self, write, read):
+        """A register write followed by a read, the way smbus2.i2c_msg transfers arrive."""
+        self.reads += 1
+        for index, byte in enumerate(self._block(list(write)[0], read.len)):
+            read.buf[index] = bytes([byte])
+
+    def write_i2c_block_data(self, address, register, data):
+        self.writes += 1
+        self.registers[register] = list(data)
+
+    def read_byte_data(self, address, register):
+        return self.read_i2c_block_data(address, register, 1)[0]
+
+    def write_byte_data(self, address, register, value):
+        self.write_i2c_block_data(address, register, [value])
+
+
+@pytest.fixture
+def sensor():
+    bus = FakeBMP280Bus()
+    bmp280 = BMP280(i2c_dev=bus)
+    bmp280.setup(mode="normal")
+    return bmp280, bus
+
+
+def test_read_all_is_one_transaction(sensor):
+    bmp280, bus = sensor
+    reads, writes = bus.reads, bus.writes
+    sample = bmp280.read_all(qnh=1013.25)
+    assert (bus.reads - reads, bus.writes - writes) == (1, 0)
+
+    assert sample.temperature == pytest.approx(25.08, abs=0.01)
+    assert sample.pressure == pytest.approx(1006.5327, abs=0.001)
+    assert sample.altitude == pytest.approx(BMP280.altitude(sample.pressure, sample.temperature, 1013.25))
+
+
+def test_read_all_reads_into_the_preallocated_buffer(sensor, monkeypatch):
+    bmp280, bus = sensor
+    monkeypatch.delattr(FakeBMP280Bus, "read_i2c_block_data")
+    buffer = bmp280._data
+    assert bmp280.read_all().temperature == pytest.approx(25.08, abs=0.01)
+    assert bmp280._data is buffer and list(buffer) == bus._data()
+
+
+def test_read_all_matches_the_getters(sensor):
+    bmp280, bus = sensor
+    reads = bus.reads
+    temperature, pressure, altitude = bmp280.get_temperature(), bmp280.get_pressure(), bmp280.get_altitude(qnh=1020)
+    getter_reads = bus.reads - reads
+
+    reads = bus.reads
+    sample = bmp280.read_all(qnh=1020)
+    assert bus.reads - reads < getter_reads
+    assert (sample.temperature, sample.pressure) == (temperature, pressure)
+    assert sample.altitude == pytest.approx(altitude)
+    with pytest.raises(AttributeError):
+        sample.pressure = 0.0
+
+
+def _calibrations(rng, count):
+    # The datasheet example, the same with dig_p1 = 0 (division guard) and random 16 bit words
+    datasheet = struct.unpack("<HhhHhhhhhhhh", CALIBRATION)
+    yield datasheet
+    yield datasheet[:3] + (0,) + datasheet[4:]
+    for _ in range(count):
+        yield tuple(rng.randint(0, 65535) if index in (0, 3) else rng.randint(-32768, 32767) for index in range(12))
+
+
+def test_compensate_batch_is_bit_identical_to_scalar():
+    pytest.importorskip("numpy")
+    rng = random.Random(18)
+    for words in _calibrations(rng, 50):
+        calibration = BMP280Calibration()
+        calibration.set_from_bytes(struct.pack("<HhhHhhhhhhhh", *words))
+        raw_temperature = [rng.randint(0, 0xFFFFF) for _ in range(200)] + [0, 0x80000, 0xFFFFF]
+        raw_pressure = [rng.randint(0, 0xFFFFF) for _ in range(200)] + [0, 0x80000, 0xFFFFF]
+
+        temperatures, pressures = calibration.compensate_batch(raw_temperature, raw_pressure)
+        for index, (temperature, pressure) in enumerate(zip(raw_temperature, raw_pressure)):
+            expected = (calibration.compensate_temperature(temperature), float(calibration.compensate_pressure(pressure)))
+            assert struct.pack("<2d", temperatures[index], pressures[index]) == struct.pack("<2d", *expected), words
@@ -0,0 +1,169 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from library.entities import UNAVAILABLE, Reading, compile_entity
+from library.ha_mqtt import HAMqttError, HAMqttTransport
+
+BASE_URL = "http://homeassistant:8123/api/states"
+
+
+class FakeMessageInfo:
+    def __init__(self, published):
+        self.published = published
+
+    def wait_for_publish(self, timeout=None):
+        pass
+
+    def is_published(self):
+        return self.published
+
+
+class FakeMqttClient:
+    """paho-mqtt Client stand-in recording what would go to the broker."""
+
+    def __init__(self, connected=True):
+        self.connected = connected
+        self.acknowledge = True
+        self.published = []
+        self.subscriptions = []
+        self.will = None
+        self.max_inflight = None
+
+    def username_pw_set(self, username, password):
+        self.credentials = (username, password)
+
+    def max_inflight_messages_set(self, count):
+        self.max_inflight = count
+
+    def reconnect_delay_set(self, min_delay, max_delay):
+        pass
+
+    def will_set(self, topic, payload, qos, retain):
+        self.will = (topic, payload, qos, retain)
+
+    def connect_async(self, host, port, keepalive):
+        pass
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def subscribe(self, topic, qos):
+        self.subscriptions.append((topic, qos))
+
+    def publish(self, topic, payload, qos, retain):
+        self.published.append((topic, payload, qos, retain))
+        return FakeMessageInfo(self.acknowledge)
+
+    def topics(self, suffix):
+        return [(topic, payload) for topic, payload, *_ in self.published if topic.endswith(suffix)]
+
+
+def _transport(**kwargs):
+    client = FakeMqttClient()
+    return HAMqttTransport("broker", node_id="test", client=client, max_inflight=7, **kwargs), client
+
+
+def _reading(object_id, unit, friendly_name, state, summary=None):
+    return Reading(compile_entity(BASE_URL, object_id, unit, friendly_name), state, 0.0, summary)
+
+
+def test_discovery_config_is_published_once_per_entity():
+    transport, client = _transport()
+    assert client.will == ("enviroment/test/status", "offline", 1, True)
+    assert client.max_inflight == 7
+
+    reading = _reading("sht45_temperature", "°C", "SHT45 Temperature", 21.5)
+    transport.publish([reading])
+    transport.publish([reading])
+    configs = [(topic, payload, qos, retain) for topic, payload, qos, retain in client.published
+               if topic.endswith("/config")]
+    assert len(configs) == 1
+    topic, payload, qos, retain = configs[0]
+    assert (topic, qos, retain) == ("homeassistant/sensor/test/sht45_temperature/config", 1, True)
+    assert json.loads(payload) == {
+        "name": "SHT45 Temperature",
+        "unique_id": "test_sht45_temperature",
+        "default_entity_id": "sensor.sht45_temperature",
+        "state_topic": "enviroment/test/sht45/state",
+        "value_template": "{{ value_json.temperature }}",
+        "json_attributes_topic": "enviroment/test/sht45/state",
+        "json_attributes_template": "{{ value_json.temperature_summary | default({}) | tojson }}",
+        "availability_topic": "enviroment/test/status",
+        "device": {"identifiers": ["test_sht45"], "name": "SHT45"},
+        "unit_of_measurement": "°C",
+        "state_class": "measurement",
+        "device_class": "temperature",
+    }
+
+
+def test_states_are_one_retained_message_per_device():
+    transport, client = _transport()
+    readings = [
+        _reading("sht45_temperature", "°C", "SHT45 Temperature", 21.5),
+        _reading("oxygen", "%", "Oxygen", 20.9),
+        _reading("sht45_humidity", "%", "SHT45 Humidity", 48.2, {"min": 47.9, "max": 48.5}),
+    ]
+    results = transport.publish(readings)
+    assert [result.item for result in results] == readings
+    assert all(result.error is None for result in results)
+
+    states = [(topic, payload, qos, retain) for topic, payload, qos, retain in client.published
+              if topic.endswith("/state")]
+    assert [(topic, qos, retain) for topic, _, qos, retain in states] == [
+        ("enviroment/test/sht45/state", 1, True), ("enviroment/test/oxygen/state", 1, True)]
+    assert json.loads(states[0][1]) == {"temperature": 21.5, "humidity": 48.2,
+                                        "humidity_summary": {"min": 47.9, "max": 48.5}}
+    assert json.loads(states[1][1]) == {"state": 20.9}
+    # An entity without unit has no state_class, and the field of a single-word id is "state"
+    oxygen = json.loads(client.topics("/oxygen/config")[0][1])
+    assert oxygen["value_template"] == "{{ value_json.state }}" and "device_class" not in oxygen
+
+    # The device message keeps the fields of the entities not in this batch; unavailable is sent as null
+    transport.post_state(f"{BASE_URL}/sensor.sht45_temperature", {"state": UNAVAILABLE, "attributes": {}})
+    assert json.loads(client.topics("/sht45/state")[-1][1]) == {
+        "temperature": None, "humidity": 48.2, "humidity_summary": {"min": 47.9, "max": 48.5}}
+
+
+def test_publish_errors():
+    transport, client = _transport(timeout=0.01)
+    reading = _reading("bmp280_pressure", "hPa", "BMP280 Pressure", 1006.5)
+
+    client.acknowledge = False
+    assert isinstance(transport.publish([reading])[0].error, HAMqttError)
+
+    client.connected = False
+    published = len(client.published)
+    with pytest.raises(HAMqttError, match="Not connected"):
+        transport.post_reading(reading)
+    # The config of the entity was already sent; the state is not published while disconnected
+    assert len(client.published) == published
+
+
+def test_discovery_is_sent_again_on_connect_and_home_assistant_birth():
+    transport, client = _transport()
+    transport.publish([_reading("sht31_temperature", "°C", "SHT31 Temperature", 22.0)])
+    config = client.topics("/sht31_temperature/config")[0]
+
+    client.published.clear()
+    transport._on_connect(client, None, None, 0)
+    assert client.published[0] == ("enviroment/test/status", "online", 1, True)
+    assert client.subscriptions == [("homeassistant/status", 1)]
+    assert client.topics("/config") == [config]
+
+    client.published.clear()
+    transport._on_message(client, None, SimpleNamespace(payload=b"online"))
+    assert client.topics("/config") == [config]
+
+    transport.close()
+    assert client.published[-1] == ("enviroment/test/status", "offline", 1, True)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import library.ha_websocket as ha_websocket
+from library.entities import Reading, compile_entity
+from library.ha_websocket import HAWebSocketError, HAWebSocketTransport
+
+URL = "ws://homeassistant:8123/api/websocket"
+
+
+class FakeWebSocket:
+    """One server side connection: answers the auth handshake, then every command through server.answer()."""
+
+    def __init__(self, server):
+        self.server = server
+        self.sent = []
+        self.incoming = asyncio.Queue()
+        self.incoming.put_nowait({"type": "auth_required"})
+
+    async def send(self, text):
+        message = json.loads(text)
+        self.sent.append(message)
+        if message["type"] == "auth":
+            self.incoming.put_nowait({"type": "auth_ok"})
+        else:
+            answer = self.server.answer(message)
+            if answer is not None:
+                self.incoming.put_nowait(answer)
+
+    async def recv(self):
+        return json.dumps(await self.incoming.get())
+
+    def drop(self):
+        self.incoming.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        return json.dumps(message)
+
+    async def close(self):
+        pass
+
+
+class FakeServer:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.connections = []
+        self.answer = lambda message: {"id": message["id"], "type": "result", "success": True, "result": None}
+
+    async def connect(self, url):
+        assert url == URL
+        if self.failures:
+            self.failures -= 1
+            raise OSError(111, "Connection refused")
+        websocket = FakeWebSocket(self)
+        self.connections.append(websocket)
+        return websocket
+
+
+@pytest.fixture
+def transports():
+    opened = []
+    yield opened
+    for transport in opened:
+        transport.close()
+
+
+def _transport(monkeypatch, transports, server, **kwargs):
+    monkeypatch.setattr(ha_websocket.websockets, "connect", server.connect)
+    transport = HAWebSocketTransport(URL, "token", **kwargs)
+    transports.append(transport)
+    return transport
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_states_are_sent_as_fire_event_after_authentication(monkeypatch, transports):
+    server = FakeServer()
+    transport = _transport(monkeypatch, transports, server, event_type="test_state")
+    _wait_for(lambda: transport.connected)
+
+    transport.post_state("http://homeassistant:8123/api/states/sensor.sht45_temperature",
+                         {"state": 21.5, "attributes": {"unit_of_measurement": "°C"}})
+    entity = compile_entity("http://homeassistant:8123/api/states", "sht45_humidity", "%", "SHT45 Humidity")
+    transport.post_reading(Reading(entity, 48.2, 0.0, {"min": 47.9}))
+
+    auth, temperature, humidity = server.connections[0].sent
+    assert auth == {"type": "auth", "access_token": "token"}
+    assert temperature == {"type": "fire_event", "event_type": "test_state", "id": 1, "event_data": {
+        "entity_id": "sensor.sht45_temperature", "state": 21.5, "attributes": {"unit_of_measurement": "°C"}}}
+    assert humidity == {"type": "fire_event", "event_type": "test_state", "id": 2, "event_data": {
+        "entity_id": "sensor.sht45_humidity", "state": 48.2,
+        "attributes": {"unit_of_measurement": "%", "friendly_name": "SHT45 Humidity", "min": 47.9}}}
+    assert (transport.request_count, transport.error_count) == (2, 0)
+
+
+def test_rejected_and_unanswered_updates_raise(monkeypatch, transports):
+    server = FakeServer()
+    transport = _transport(monkeypatch, transports, server, timeout=0.05)
+    _wait_for(lambda: transport.connected)
+
+    server.answer = lambda message: {"id": message["id"], "type": "result", "success": False,
+                                     "error": {"code": "unauthorized", "message": "Unauthorized"}}
+    with pytest.raises(HAWebSocketError, match="unauthorized: Unauthorized"):
+        transport.post_state("sensor.oxygen", {"state": 20.9, "attributes": {}})
+
+    server.answer = lambda message: None
+    with pytest.raises(HAWebSocketError, match="Timed out"):
+        transport.post_state("sensor.oxygen", {"state": 20.9, "attributes": {}})
+    assert transport.error_count == 2
+
+
+def test_lost_connection_fails_the_pending_update(monkeypatch, transports):
+    server = FakeServer()
+    transport = _transport(monkeypatch, transports, server)
+    _wait_for(lambda: transport.connected)
+
+    server.answer = lambda message: server.connections[-1].drop()
+    with pytest.raises(HAWebSocketError, match="lost"):
+        transport.post_state("sensor.oxygen", {"state": 20.9, "attributes": {}})
+
+
+def test_reconnect_backoff_doubles_up_to_the_limit_and_resets(monkeypatch, transports):
+    backoffs = []
+
+    def uniform(low, high):
+        backoffs.append(2 * high)
+        return high
+
+    monkeypatch.setattr(ha_websocket, "MIN_BACKOFF", 0.002)
+    monkeypatch.setattr(ha_websocket, "MAX_BACKOFF", 0.016)
+    monkeypatch.setattr(ha_websocket.random, "uniform", uniform)
+    server = FakeServer(failures=5)
+    transport = _transport(monkeypatch, transports, server)
+    _wait_for(lambda: transport.connected)
+    assert backoffs == pytest.approx([0.002, 0.004, 0.008, 0.016, 0.016])
+
+    # A connection that was established resets the backoff once it drops
+    transport._loop.call_soon_threadsafe(server.connections[0].drop)
+    _wait_for(lambda: len(server.connections) == 2 and transport.connected)
+    assert backoffs == pytest.approx([0.002, 0.004, 0.008, 0.016, 0.016, 0.002])
+    assert transport.reconnect_count == 6
+    transport.post_state("sensor.oxygen", {"state": 20.9, "attributes": {}})
+    assert server.connections[1].sent[-1]["id"] == 1
+
+
+def test_close_fails_the_pending_update_and_stops_the_thread(monkeypatch, transports):
+    server = FakeServer()
+    transport = _transport(monkeypatch, transports, server)
+    _wait_for(lambda: transport.connected)
+
+    server.answer = lambda message: None
+    errors = []
+
+    def post():
+        try:
+            transport.post_state("sensor.oxygen", {"state": 20.9, "attributes": {}})
+        except HAWebSocketError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=post)
+    thread.start()
+    _wait_for(lambda: len(server.connections[0].sent) == 2)
+    transport.close()
+    thread.join(1.0)
+    assert len(errors) == 1 and not transport._thread.is_alive()
+    with pytest.raises(HAWebSocketError, match="closed"):
+        transport.post_state("sensor.oxygen", {"state": 20.9, "attributes": {}})
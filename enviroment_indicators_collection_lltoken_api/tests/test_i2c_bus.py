@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from library.i2c_bus import I2CBus, RecoveryPolicy
+from library.scheduler import DeadlineScheduler
+
+ADDRESS = 0x44
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FaultySMBus:
+    """SMBus stand-in that NACKs (OSError) the transfers of the addresses in nack."""
+
+    def __init__(self):
+        self.nack = set()
+        self.calls = []
+        self.closed = False
+
+    def _transfer(self, address):
+        self.calls.append(address)
+        if address in self.nack:
+            raise OSError(121, "Remote I/O error")
+
+    def read_byte(self, address):
+        self._transfer(address)
+        return 0x5A
+
+    def write_quick(self, address):
+        self._transfer(address)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake():
+    return FaultySMBus()
+
+
+def _bus(smbus, policy=None, opener=None, clock=None):
+    delays = []
+    bus = I2CBus(5, smbus=smbus, policy=policy or RecoveryPolicy(), opener=opener, clock=clock or FakeClock(),
+                 sleep=delays.append)
+    return bus, delays
+
+
+def test_failed_transfer_is_retried_with_backoff(fake):
+    bus, delays = _bus(fake, RecoveryPolicy(retries=2, backoff=0.005))
+    fake.nack.add(ADDRESS)
+    with pytest.raises(OSError):
+        bus.read_byte(ADDRESS)
+    assert fake.calls == [ADDRESS] * 3
+    assert delays == [0.005, 0.01]
+    assert not bus.is_degraded(ADDRESS)
+
+    fake.nack.clear()
+    assert bus.read_byte(ADDRESS) == 0x5A
+    assert bus.stats()["0x44"]["retries"] == 2
+
+
+def test_device_degrades_after_consecutive_failures_and_is_not_retried(fake):
+    bus, _ = _bus(fake, RecoveryPolicy(retries=1, degrade_after=3))
+    fake.nack.add(ADDRESS)
+    for _ in range(3):
+        assert not bus.is_degraded(ADDRESS)
+        with pytest.raises(OSError):
+            bus.read_byte(ADDRESS)
+    assert bus.is_degraded(ADDRESS)
+
+    fake.calls.clear()
+    with pytest.raises(OSError):
+        bus.read_byte(ADDRESS)
+    assert fake.calls == [ADDRESS]
+
+
+def test_probe_backs_off_and_clears_degraded_state(fake):
+    clock = FakeClock()
+    bus, _ = _bus(fake, RecoveryPolicy(retries=0, degrade_after=1, probe_interval=1.0, max_probe_interval=60.0),
+                  clock=clock)
+    fake.nack.add(ADDRESS)
+    with pytest.raises(OSError):
+        bus.read_byte(ADDRESS)
+
+    fake.calls.clear()
+    assert not bus.available(ADDRESS)
+    assert fake.calls == []  # probe not due yet
+    clock.now = 1.0
+    assert not bus.available(ADDRESS)  # probe fails, next one after 2 s
+    clock.now = 2.5
+    assert not bus.available(ADDRESS)
+    assert fake.calls == [ADDRESS]
+
+    fake.nack.clear()
+    clock.now = 3.0
+    assert bus.available(ADDRESS)
+    assert not bus.is_degraded(ADDRESS)
+    assert bus.stats()["0x44"]["recoveries"] == 1
+
+
+def test_bus_is_reopened_after_repeated_failures(fake):
+    opened = []
+
+    def opener(bus_number):
+        opened.append(bus_number)
+        return FaultySMBus()
+
+    bus, _ = _bus(fake, RecoveryPolicy(retries=5, reopen_after=5), opener=opener)
+    fake.nack.add(ADDRESS)
+    assert bus.read_byte(ADDRESS) == 0x5A  # the fifth attempt reopens the bus, the sixth succeeds
+    assert opened == [5]
+    assert fake.closed
+    assert bus.reopens == 1
+
+
+def test_scheduler_skips_degraded_device(fake):
+    bus, _ = _bus(fake, RecoveryPolicy(retries=0, degrade_after=1))
+    fake.nack.add(ADDRESS)
+    with pytest.raises(OSError):
+        bus.read_byte(ADDRESS)
+
+    scheduler = DeadlineScheduler(stats_interval=0)
+    job = scheduler.add("sht45", 0.01, lambda: bus.read_byte(ADDRESS), ready=lambda: bus.available(ADDRESS))
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.1, scheduler.stop)
+        await scheduler.run_async()
+
+    fake.calls.clear()
+    asyncio.run(run())
+    assert job.runs == 0
+    assert job.skipped > 0
+    assert fake.calls == []
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from library.measurement import Measurement, measure_async
+from library.watchdog import SensorWatchdog
+
+
+def test_burst_waits_on_the_loop_not_under_the_deadline():
+    samples = iter(range(10))
+    calls = []
+
+    def collect():
+        calls.append(time.monotonic())
+        return float(next(samples))
+
+    def combine(results):
+        return sum(results) / len(results), len(results)
+
+    burst = Measurement("oxygen", None, collect, 0.0, 10, 0.02, combine)
+    watchdog = SensorWatchdog("oxygen", timeout=0.05)
+    try:
+        # The burst takes about 0.18 s, far longer than the timeout of each read
+        assert asyncio.run(watchdog.measure(burst)) == (4.5, 10)
+    finally:
+        watchdog.close()
+    assert watchdog.timeouts == 0
+    assert calls[-1] - calls[0] >= 9 * 0.02
+
+
+def test_failing_sample_fails_the_burst():
+    def collect():
+        raise OSError(121, "Remote I/O error")
+
+    burst = Measurement("oxygen", None, collect, 0.0, 3, 0.0, lambda results: (max(results),))
+    assert asyncio.run(measure_async(burst)) is None
@@ -0,0 +1,33 @@
+from library.outbox import Outbox
+
+
+def _record(index):
+    return {"url": "http://ha/api/states/sensor.test", "payload": {"state": index}, "ts": index}
+
+
+def test_ack_after_replayed_segment_was_dropped(tmp_path):
+    outbox = Outbox(str(tmp_path), segment_size=300, max_segments=2)
+    for index in range(9):
+        outbox.append(_record(index))
+    batch = outbox.peek(3)
+
+    # The outbox fills up while the batch is being posted
+    for index in range(9, 19):
+        outbox.append(_record(index))
+    pending = outbox.pending
+    assert outbox.dropped_count > 0
+
+    outbox.ack(batch[-1][0], len(batch))
+    assert outbox.pending == pending
+    assert len(outbox.peek(100)) == pending
+
+
+def test_ack_counts_only_undelivered_records(tmp_path):
+    outbox = Outbox(str(tmp_path), segment_size=300, max_segments=3)
+    for index in range(6):
+        outbox.append(_record(index))
+    batch = outbox.peek(4)
+    outbox.ack(batch[1][0], 2)
+    outbox.ack(batch[-1][0], len(batch))
+    assert outbox.pending == 2
+    assert [record["ts"] for _, record in outbox.peek(10)] == [4, 5]
@@ -0,0 +1,137 @@
+import math
+import random
+
+import pytest
+
+import library.DFRobot_Oxygen as oxygen
+
+KEY = 0.2  # vol% per raw unit, read from GET_KEY_REGISTER as 200
+
+
+class FakeOxygenBus:
+    """SMBus stand-in answering the key and the next queued concentration; records register reads and writes."""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.reads = []
+        self.writes = []
+
+    def read_i2c_block_data(self, address, register, length):
+        self.reads.append(register)
+        if register == oxygen.GET_KEY_REGISTER:
+            return [round(KEY * 1000)]
+        raw = round(self.values.pop(0) / KEY * 100)
+        return [raw // 100, raw // 10 % 10, raw % 10]
+
+    def write_i2c_block_data(self, address, register, data):
+        self.writes.append((register, list(data)))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(oxygen.time, "sleep", slept.append)
+    return slept
+
+
+def _sensor(values, **kwargs):
+    bus = FakeOxygenBus(values)
+    return oxygen.DFRobot_Oxygen_IIC(bus, oxygen.ADDRESS_3, **kwargs), bus
+
+
+def _values(rng, count):
+    return [round(rng.uniform(19.0, 21.0) / (KEY / 100)) * (KEY / 100) for _ in range(count)]
+
+
+def test_ring_average_is_the_mean_of_the_last_readings(sleeps):
+    values = _values(random.Random(21), 250)
+    sensor, _ = _sensor(values)
+    for index in range(len(values)):
+        window = values[max(0, index - 19):index + 1]
+        assert sensor.get_oxygen_data(20) == pytest.approx(math.fsum(window) / len(window), abs=1e-9)
+
+
+@pytest.mark.parametrize("first, second", [(5, 10), (10, 5), (10, 1)])
+def test_changing_collect_num_restarts_the_average(sleeps, first, second):
+    values = _values(random.Random(first * second), 30)
+    sensor, _ = _sensor(values)
+    for _ in range(7):
+        sensor.get_oxygen_data(first)
+    for count in range(1, 15):
+        window = values[7:7 + count][-second:]
+        assert sensor.get_oxygen_data(second) == pytest.approx(math.fsum(window) / len(window), abs=1e-9)
+
+
+def test_collect_num_out_of_range(sleeps):
+    sensor, bus = _sensor([20.9])
+    assert sensor.get_oxygen_data(0) == -1
+    assert sensor.get_oxygen_data(101) == -1
+    assert oxygen.OXYGEN_DATA_REGISTER not in bus.reads
+
+
+def test_key_is_read_once_and_again_after_calibration(sleeps):
+    sensor, bus = _sensor([20.0, 20.0, 18.0])
+    sensor.get_oxygen_data(10)
+    sensor.get_oxygen_data(10)
+    assert bus.reads.count(oxygen.GET_KEY_REGISTER) == 1
+    assert sleeps == [oxygen.FLASH_DELAY]
+
+    sensor.calibrate(20.9, 0)
+    assert sensor.key is None
+    assert bus.writes == [(oxygen.USER_SET_REGISTER, [209])]
+    # The average restarts: samples scaled with the old key are dropped
+    assert sensor.get_oxygen_data(10) == pytest.approx(18.0)
+    assert bus.reads.count(oxygen.GET_KEY_REGISTER) == 2
+
+
+def test_ema_weights_readings_by_elapsed_time(sleeps):
+    now = [0.0]
+    sensor, _ = _sensor([20.0, 18.0, 18.0, 19.0], ema_time_constant=60.0, clock=lambda: now[0])
+    assert sensor.get_oxygen_data(20) == pytest.approx(20.0)
+    now[0] = 60.0
+    expected = 20.0 - 2.0 * (1.0 - math.exp(-1.0))
+    assert sensor.get_oxygen_data(20) == pytest.approx(expected)
+    # A reading right after the previous one barely moves the average
+    now[0] = 60.6
+    assert sensor.get_oxygen_data(20) == pytest.approx(expected + (18.0 - expected) * (1.0 - math.exp(-0.01)))
+
+    sensor.reset_average()
+    now[0] = 61.0
+    assert sensor.get_oxygen_data(20) == pytest.approx(19.0)
+
+
+def test_burst_rejects_a_spike(sleeps):
+    readings = [20.9, 20.92, 20.88, 20.9, 23.9, 20.9, 20.92, 20.88]
+    sensor, _ = _sensor(readings)
+    concentration, spread = sensor.read_oxygen_burst(len(readings), 0.02)
+    kept = readings[:4] + readings[5:]
+    assert concentration == pytest.approx(math.fsum(kept) / len(kept))
+    assert spread == pytest.approx(math.sqrt(math.fsum((x - 20.9) ** 2 for x in kept) / len(kept)))
+    # One FLASH_DELAY for the key, then count - 1 waits between the readings
+    assert sleeps == [oxygen.FLASH_DELAY] + [0.02] * (len(readings) - 1)
+
+
+def test_burst_keeps_readings_within_one_register_step(sleeps):
+    sensor, _ = _sensor([20.0])
+    sensor.get_oxygen_data(1)
+    # The MAD of identical readings is 0; a one step difference is noise, not an outlier
+    samples = [20.0] * 8 + [20.0 + KEY * 0.01]
+    assert sensor.combine_burst(samples) == sensor.combine_burst(samples, rejection=float("inf"))
+    assert sensor.combine_burst(samples)[0] == pytest.approx(math.fsum(samples) / len(samples))
+    assert sensor.combine_burst(samples + [20.0 + KEY * 0.02])[0] == pytest.approx(math.fsum(samples) / len(samples))
+
+
+def test_burst_without_rejection_keeps_every_reading(sleeps):
+    sensor, _ = _sensor([20.0])
+    sensor.get_oxygen_data(1)
+    # Identical readings have a MAD of 0, which must not turn an infinite threshold into NaN
+    samples = [20.0] * 8 + [23.0]
+    assert sensor.combine_burst(samples, rejection=math.inf) == (pytest.approx(20.0 + 3.0 / 9),
+                                                                pytest.approx(math.sqrt(8) / 3))
+
+
+@pytest.mark.parametrize("count", [0, 101])
+def test_burst_size_out_of_range(sleeps, count):
+    sensor, _ = _sensor([])
+    with pytest.raises(ValueError):
+        sensor.read_oxygen_burst(count)
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from library.i2c_bus import I2CBus
+from library.measurement import Measurement, measure_async
+from library.scheduler import DeadlineScheduler
+from library.SHT3x import SHT3x
+from library.SHT4x import SHT4x
+from library.sensirion_common import crc8
+from library.watchdog import SensorWatchdog
+
+SHT3X_ADDRESS = 0x45
+SHT4X_ADDRESS = 0x44
+
+
+def _word(value):
+    data = bytes([value >> 8, value & 0xFF])
+    return data + bytes([crc8(data)])
+
+
+class SimBus:
+    """SMBus stand-in: a device NACKs (OSError) until the conversion started by its last command has finished."""
+
+    def __init__(self, conversions, frame=_word(0x6666) + _word(0x8000)):
+        self.conversions = conversions
+        self.frame = frame
+        self.ready = {}
+        self.log = []
+
+    def _start(self, address):
+        self.log.append(("trigger", address, time.monotonic()))
+        self.ready[address] = time.monotonic() + self.conversions[address]
+
+    def write_byte(self, address, value):
+        self._start(address)
+
+    def write_i2c_block_data(self, address, register, data):
+        self._start(address)
+
+    def i2c_rdwr(self, message):
+        if time.monotonic() < self.ready.get(message.addr, float("inf")):
+            self.log.append(("nack", message.addr, time.monotonic()))
+            raise OSError(121, "Remote I/O error")
+        self.log.append(("read", message.addr, time.monotonic()))
+        for index, byte in enumerate(self.frame):
+            message.buf[index] = bytes([byte])
+
+
+def _collect(sensor):
+    def collect():
+        sensor.read_measurement()
+        return sensor.temperature, sensor.humidity
+    return collect
+
+
+def _sensors(sim):
+    bus = I2CBus(5, smbus=sim)
+    sht3x = SHT3x(bus=bus, address=SHT3X_ADDRESS)
+    sht4x = SHT4x(bus=bus, address=SHT4X_ADDRESS)
+    sim.log.clear()
+    return [
+        Measurement("sht31", sht3x.start_measurement, _collect(sht3x), sht3x.conversion_time),
+        Measurement("sht45", sht4x.start_measurement, _collect(sht4x), SHT4x.VALID_MODES["high"][1]),
+    ]
+
+
+def test_scheduler_triggers_all_then_collects_in_ready_order():
+    # Datasheet typical conversion times, within the drivers' worst-case waits (15.5 ms and 10 ms)
+    sim = SimBus({SHT3X_ADDRESS: 0.0125, SHT4X_ADDRESS: 0.0083})
+    measurements = _sensors(sim)
+    watchdogs = {measurement.name: SensorWatchdog(measurement.name) for measurement in measurements}
+    scheduler = DeadlineScheduler(stats_interval=0)
+    results = {}
+
+    def job(measurement):
+        async def run():
+            results[measurement.name] = await watchdogs[measurement.name].measure(measurement)
+            if len(results) == len(measurements):
+                scheduler.stop()
+        return run
+
+    # Sensors due at the same deadline, as with the default sample_interval
+    for measurement in measurements:
+        scheduler.add(measurement.name, 10.0, job(measurement))
+    try:
+        asyncio.run(scheduler.run_async())
+    finally:
+        for watchdog in watchdogs.values():
+            watchdog.close()
+
+    assert results["sht31"] == pytest.approx((25.0, 50.0), abs=0.01)
+    assert results["sht45"] == pytest.approx((25.0, 56.5), abs=0.01)
+    # Every trigger precedes the first read, the reads come in ready-time order (shortest conversion first)
+    # and none is NACKed; the cycle costs about the longest conversion, not the sum of both
+    assert [(event, address) for event, address, _ in sim.log] == [
+        ("trigger", SHT3X_ADDRESS), ("trigger", SHT4X_ADDRESS), ("read", SHT4X_ADDRESS), ("read", SHT3X_ADDRESS),
+    ]
+    elapsed = sim.log[-1][2] - sim.log[0][2]
+    assert elapsed < measurements[0].conversion_time + measurements[1].conversion_time
+
+
+def test_read_before_conversion_is_nacked():
+    sim = SimBus({SHT3X_ADDRESS: 0.05, SHT4X_ADDRESS: 0.05})
+    measurement = _sensors(sim)[0]._replace(conversion_time=0.0)
+    assert asyncio.run(measure_async(measurement)) is None
+    assert ("nack", SHT3X_ADDRESS) in [(event, address) for event, address, _ in sim.log]
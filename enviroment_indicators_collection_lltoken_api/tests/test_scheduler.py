@@ -0,0 +1,52 @@
+import asyncio
+import signal
+import threading
+
+from library.scheduler import DeadlineScheduler
+
+
+def test_stop_from_another_thread_cancels_the_job_tasks():
+    scheduler = DeadlineScheduler(stats_interval=None)
+    runs = []
+    cancelled = []
+
+    async def job():
+        runs.append(1)
+        if len(runs) == 3:
+            threading.Thread(target=scheduler.stop).start()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+    scheduler.add("job", 0.01, job)
+    asyncio.run(asyncio.wait_for(scheduler.run_async(), 1.0))
+    assert (len(runs), cancelled) == (3, [1])
+
+
+def test_stop_from_a_signal_handler():
+    scheduler = DeadlineScheduler(stats_interval=None)
+    runs = []
+
+    def job():
+        runs.append(1)
+        if len(runs) == 2:
+            signal.raise_signal(signal.SIGUSR1)
+
+    async def main():
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, scheduler.stop)
+        scheduler.add("job", 0.01, job)
+        await asyncio.wait_for(scheduler.run_async(), 1.0)
+
+    asyncio.run(main())
+    assert len(runs) == 2
+
+
+def test_stop_before_run_returns_immediately():
+    scheduler = DeadlineScheduler(stats_interval=None)
+    runs = []
+    scheduler.add("job", 0.01, lambda: runs.append(1))
+    scheduler.stop()
+    asyncio.run(asyncio.wait_for(scheduler.run_async(), 1.0))
+    assert runs == []
@@ -0,0 +1,68 @@
+import pytest
+
+from library.sensirion_common import CRC8_INIT, CRC8_POLYNOMIAL, FrameReader, crc8, decode_frame
+
+
+def _crc8_bitwise(data):
+    crc = CRC8_INIT
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC8_POLYNOMIAL if crc & 0x80 else crc << 1) & 0xFF
+    return crc
+
+
+def _word(value):
+    data = bytes([value >> 8, value & 0xFF])
+    return data + bytes([crc8(data)])
+
+
+@pytest.mark.parametrize("data, expected", [(b"\xbe\xef", 0x92), (b"\x00\x00", 0x81), (b"", 0xFF)])
+def test_crc8_reference_vectors(data, expected):
+    # 0xBEEF -> 0x92 is the example of the SHT3x and SHT4x datasheets
+    assert crc8(data) == expected
+
+
+def test_crc8_table_matches_bitwise_crc():
+    assert all(crc8(bytes([high, low])) == _crc8_bitwise(bytes([high, low])) for high in range(256) for low in range(256))
+
+
+def test_decode_frame():
+    frame = _word(0x6666) + _word(0x8000)
+    assert decode_frame(frame) == (0x6666, 0x8000)
+    for index in range(len(frame)):
+        corrupt = bytearray(frame)
+        corrupt[index] ^= 0x01
+        with pytest.raises(ValueError):
+            decode_frame(corrupt)
+
+
+def test_frame_reader_reuses_its_buffer():
+    class FakeBus:
+        def __init__(self, frame):
+            self.frame = frame
+
+        def i2c_rdwr(self, message):
+            for index, byte in enumerate(self.frame):
+                message.buf[index] = bytes([byte])
+
+    reader = FrameReader(0x44)
+    buffer = reader.buffer
+    assert reader.read(FakeBus(_word(0x6666) + _word(0x8000))) == (0x6666, 0x8000)
+    assert reader.read(FakeBus(_word(0x1234) + _word(0xBEEF))) == (0x1234, 0xBEEF)
+    assert reader.buffer is buffer
+
+
+def test_frame_reader_poll_on_plain_smbus():
+    class NackingBus:
+        def i2c_rdwr(self, message):
+            raise OSError(121, "Remote I/O error")
+
+    class BrokenBus:
+        def i2c_rdwr(self, message):
+            raise OSError(5, "Input/output error")
+
+    reader = FrameReader(0x44)
+    assert reader.poll(NackingBus()) is None
+    with pytest.raises(OSError):
+        reader.poll(BrokenBus())
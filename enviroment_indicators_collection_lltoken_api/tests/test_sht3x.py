@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from library.i2c_bus import I2CBus, RecoveryPolicy
+from library.SHT3x import SHT3x
+from library.sensirion_common import crc8
+
+ADDRESS = 0x44
+
+
+def _word(value):
+    data = bytes([value >> 8, value & 0xFF])
+    return data + bytes([crc8(data)])
+
+
+class FakeSHT3x:
+    """SMBus stand-in for an SHT3x: NACKs a read until a result is available, and each result only once."""
+
+    def __init__(self, frame=_word(0x6666) + _word(0x8000)):
+        self.frame = frame
+        self.commands = []
+        self.available = False
+
+    def write_i2c_block_data(self, address, register, data):
+        command = register << 8 | data[0]
+        self.commands.append((command, time.monotonic()))
+        if command == SHT3x.SINGLE_SHOT["high"][0]:
+            self.available = True
+
+    def i2c_rdwr(self, message):
+        if not self.available:
+            raise OSError(121, "Remote I/O error")
+        self.available = False
+        for index, byte in enumerate(self.frame):
+            message.buf[index] = bytes([byte])
+
+
+@pytest.fixture
+def fake():
+    return FakeSHT3x()
+
+
+@pytest.fixture
+def bus(fake):
+    return I2CBus(5, smbus=fake, policy=RecoveryPolicy(degrade_after=3), sleep=lambda seconds: None)
+
+
+def test_break_before_periodic_command(fake, bus):
+    SHT3x(bus=bus, address=ADDRESS, mps=2)
+    (first, sent), (second, started) = fake.commands
+    assert (first, second) == (SHT3x.CMD_BREAK, SHT3x.PERIODIC[2]["high"])
+    assert started - sent >= SHT3x.BREAK_TIME
+
+
+def test_periodic_fetch_without_new_data_keeps_last_values(fake, bus):
+    sensor = SHT3x(bus=bus, address=ADDRESS, mps=2)
+    fake.available = True
+    assert sensor.read_measurement()
+    assert (sensor.temperature, sensor.humidity) == pytest.approx((25.0, 50.0), abs=0.01)
+
+    # Fetching faster than the sensor measures: NACKs are neither retried nor failures of the device
+    for _ in range(10):
+        assert not sensor.read_measurement()
+    assert (sensor.temperature, sensor.humidity) == pytest.approx((25.0, 50.0), abs=0.01)
+    stats = bus.stats()["0x44"]
+    assert (stats["errors"], stats["retries"], stats["degraded"]) == (0, 0, False)
+    assert fake.commands[-1][0] == SHT3x.CMD_FETCH_DATA
+
+
+def test_single_shot(fake, bus):
+    sensor = SHT3x(bus=bus, address=ADDRESS)
+    assert sensor.update()
+    assert [command for command, _ in fake.commands] == [SHT3x.CMD_BREAK, SHT3x.SINGLE_SHOT["high"][0]]
+    assert (sensor.temperature, sensor.humidity) == pytest.approx((25.0, 50.0), abs=0.01)
+
+
+@pytest.mark.parametrize("mps", [None, 2])
+def test_crc_failure(fake, bus, mps):
+    sensor = SHT3x(bus=bus, address=ADDRESS, mps=mps)
+    fake.frame = fake.frame[:5] + bytes([fake.frame[5] ^ 0xFF])
+    sensor.start_measurement()
+    fake.available = True
+    with pytest.raises(ValueError):
+        sensor.read_measurement()
+    assert not sensor._valid
+    assert sensor.temperature is None
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+import pytest
+
+from library.measurement import Measurement
+from library.watchdog import SensorWatchdog
+
+
+def test_timed_out_measurement_counts_in_latency_percentiles():
+    release = threading.Event()
+    watchdog = SensorWatchdog("stuck", timeout=0.05)
+    measurement = Measurement("stuck", None, lambda: release.wait(5) and (1.0,), 0.0)
+
+    async def measure():
+        with pytest.raises(TimeoutError):
+            await watchdog.measure(measurement)
+
+    try:
+        asyncio.run(measure())
+        assert watchdog.timeouts == 1
+        assert not watchdog.ready()
+        assert watchdog.percentiles()[0.99] >= 0.05
+    finally:
+        release.set()
+        watchdog.close()
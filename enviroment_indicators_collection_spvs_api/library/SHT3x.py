@@ -0,0 +1,179 @@
+# SHT3x.py
+# intended for reading Sensirion SHT3x device family (SHT30, SHT31, SHT35) through the i2c bus
+# use: from library.SHT3x import SHT3x
+
+
+from smbus2 import SMBus
+import time
+from .sensirion_common import FrameReader, crc8, TEMPERATURE_OFFSET, TEMPERATURE_SCALE, SHT3X_HUMIDITY_SCALE
+
+
+class SHT3x:
+    """
+    Class to interface with the Sensirion SHT3x temperature and humidity sensor family.
+
+    Supports single shot measurements (without clock stretching) and periodic data
+    acquisition. In single shot mode start_measurement() sends the command and returns
+    the datasheet maximum measurement duration of the repeatability; in periodic mode
+    the sensor measures on its own at 0.5 to 10 measurements per second and
+    read_measurement() fetches the latest result with 0xE000 without waiting.
+    Every word read is checked against its CRC-8.
+    """
+
+    ADDRESS = 0x44          # I2C address of the SHT3x sensor: 0x44 (ADDR low) or 0x45 (ADDR high)
+    # repeatability: [command, maximum measurement duration in seconds]
+    SINGLE_SHOT = {
+        "high":   [0x2400, 0.0155],
+        "medium": [0x240B, 0.0065],
+        "low":    [0x2416, 0.0045],
+    }
+    # measurements per second: {repeatability: command}
+    PERIODIC = {
+        0.5: {"high": 0x2032, "medium": 0x2024, "low": 0x202F},
+        1:   {"high": 0x2130, "medium": 0x2126, "low": 0x212D},
+        2:   {"high": 0x2236, "medium": 0x2220, "low": 0x222B},
+        4:   {"high": 0x2334, "medium": 0x2322, "low": 0x2329},
+        10:  {"high": 0x2737, "medium": 0x2721, "low": 0x272A},
+    }
+    CMD_FETCH_DATA = 0xE000
+    CMD_BREAK = 0x3093
+    CMD_SOFT_RESET = 0x30A2
+    BREAK_TIME = 0.001      # seconds the sensor needs to stop periodic mode before it accepts a command
+
+    def __init__(self, bus=1, address=ADDRESS, repeatability="high", mps=None):
+        """
+        :param bus: Bus number or an already opened, SMBus-compatible handle (e.g. library.i2c_bus.I2CBus)
+        :param repeatability: "high", "medium" or "low"
+        :param mps: Measurements per second for periodic mode (0.5, 1, 2, 4 or 10); None for single shot
+        :raises ValueError: If repeatability or mps is invalid
+        """
+
+        if repeatability not in SHT3x.SINGLE_SHOT:
+            raise ValueError("Invalid repeatability setting")
+        if mps is not None and mps not in SHT3x.PERIODIC:
+            raise ValueError("Invalid measurements per second setting")
+        self._i2c_address = address
+        self._bus = SMBus(bus) if isinstance(bus, int) else bus
+        self._repeatability = repeatability
+        self._mps = mps
+        self._frame = FrameReader(self._i2c_address)
+        self._valid = False
+        self._temperature = None
+        self._humidity = None
+
+        # The sensor may still be in periodic mode from a previous run, where it ignores other commands
+        self._write_command(SHT3x.CMD_BREAK)
+        time.sleep(SHT3x.BREAK_TIME)
+        if mps is not None:
+            self._write_command(SHT3x.PERIODIC[mps][repeatability])
+
+    @property
+    def periodic(self):
+        return self._mps is not None
+
+    @property
+    def conversion_time(self):
+        """Seconds between start_measurement() and read_measurement(); 0 in periodic mode."""
+        return 0.0 if self.periodic else SHT3x.SINGLE_SHOT[self._repeatability][1]
+
+    def _write_command(self, command):
+        self._bus.write_i2c_block_data(self._i2c_address, command >> 8, [command & 0xFF])
+
+    def _read_data_with_crc(self):
+        return self._frame.read(self._bus)
+
+    def start_measurement(self) -> float:
+        """
+        Sends the single shot measurement command without waiting for the result.
+        Does nothing in periodic mode, where the sensor is always measuring.
+
+        :return: The time in seconds after which the result can be read
+        """
+
+        if not self.periodic:
+            self._write_command(SHT3x.SINGLE_SHOT[self._repeatability][0])
+        return self.conversion_time
+
+    def read_measurement(self):
+        """
+        Reads the result of start_measurement() (single shot) or fetches the latest periodic result.
+
+        In periodic mode the sensor NACKs a fetch when it has not measured since the previous one;
+        the last values are then kept and False is returned.
+
+        :return: True when new values were read
+        :raises ValueError: If the CRC8 check fails
+        :raises OSError: If the sensor does not answer (e.g. single shot conversion not finished)
+        """
+
+        try:
+            if self.periodic:
+                self._write_command(SHT3x.CMD_FETCH_DATA)
+                words = self._frame.poll(self._bus)
+                if words is None:
+                    return False
+            else:
+                words = self._read_data_with_crc()
+            self._temperature, self._humidity = words
+            self._valid = True
+            return True
+        except:
+            self._valid = False
+            raise
+
+    def update(self) -> bool:
+        """
+        Updates the temperature and humidity readings from the sensor
+
+        :returns: True when new readings were stored and False when updating failed (or, in periodic mode,
+                  when there was no new result)
+        """
+
+        try:
+            time.sleep(self.start_measurement())
+            return self.read_measurement()
+        except:
+            return False
+
+    def stop(self):
+        """Leaves periodic mode (break command); the sensor returns to single shot mode."""
+        if self.periodic:
+            self._write_command(SHT3x.CMD_BREAK)
+            self._mps = None
+
+    def reset(self) -> bool:
+        """
+        Soft resets the sensor, which also ends periodic mode.
+
+        :return: True when send command was ok, False when send command failed
+        """
+
+        try:
+            self._write_command(SHT3x.CMD_SOFT_RESET)
+            self._mps = None
+            time.sleep(0.0015)
+            return True
+        except:
+            return False
+
+    @property
+    def temperature(self):
+        """
+        The temperature in degrees Celsius of the last measurement, or None if there was none.
+        """
+
+        if self._temperature is None:
+            return None
+        return TEMPERATURE_OFFSET + TEMPERATURE_SCALE * self._temperature
+
+    @property
+    def humidity(self):
+        """
+        The relative humidity in percent of the last measurement, or None if there was none.
+        """
+
+        if self._humidity is None:
+            return None
+        return max(min(SHT3X_HUMIDITY_SCALE * self._humidity, 100.0), 0.0)
+
+    _calculate_crc8 = staticmethod(crc8)
@@ -1,13 +1,15 @@
 # SHT4x.py
 # intended for reading Sensirion SHT4x device family through the i2c bus
-# use: from SHT4x import SHT4x
+# use: from library.SHT4x import SHT4x
 
 __author__ = "Thorsten Schnebeck"
 __date__ = "2023-05-29"
 
 
-from smbus2 import SMBus, i2c_msg
+from smbus2 import SMBus
 import time
+from .sensirion_common import (FrameReader, crc8, TEMPERATURE_OFFSET, TEMPERATURE_SCALE, SHT4X_HUMIDITY_OFFSET,
+                               SHT4X_HUMIDITY_SCALE)
 
 
 class SHT4x:
@@ -36,7 +38,9 @@ class SHT4x:
     def __init__(self, bus=1, address=ADDRESS, mode="high"):
         self._i2c_bus = bus
         self._i2c_address = address
-        self._bus = SMBus(self._i2c_bus)
+        # bus is a bus number or an already opened, SMBus-compatible handle (e.g. library.i2c_bus.I2CBus)
+        self._bus = SMBus(self._i2c_bus) if isinstance(bus, int) else bus
+        self._frame = FrameReader(address)
         self._valid = False
         self._serial_number = "None"
         self._mode = 0
@@ -62,15 +66,7 @@ class SHT4x:
         self._bus.write_byte(self._i2c_address, command)
 
     def _read_data_with_crc(self):
-        read = i2c_msg.read(self._i2c_address, 6)
-        self._bus.i2c_rdwr(read)
-        data = list(read)
-        crc1 = SHT4x._calculate_crc8(data[0:2])
-        crc2 = SHT4x._calculate_crc8(data[3:5])
-        if crc1 == data[2] and crc2 == data[5]:
-            return [data[0] << 8 | data[1], data[3] << 8 | data[4]]
-        else:
-            raise ValueError("CRC8 check failed")
+        return self._frame.read(self._bus)
 
     def _get_serial_number(self) -> list:
         try:
@@ -103,15 +99,39 @@ class SHT4x:
         """
 
         try:
-            self._write_command(self._mode)
-            time.sleep(self._delay)
-            self._temperature, self._humidity = self._read_data_with_crc()
-            self._valid = True
+            time.sleep(self.start_measurement())
+            self.read_measurement()
             return True
         except:
             self._valid = False
             return False
 
+    def start_measurement(self) -> float:
+        """
+        Sends the measurement command of the current mode without waiting for the result.
+        Use this to overlap the conversion time with other work, then call read_measurement().
+
+        :return: The conversion time in seconds after which the result can be read
+        """
+
+        self._write_command(self._mode)
+        return self._delay
+
+    def read_measurement(self):
+        """
+        Reads the result of a measurement started with start_measurement() and stores it in attributes
+
+        :raises ValueError: If the CRC8 check fails
+        :raises OSError: If the sensor does not answer (e.g. conversion not finished yet)
+        """
+
+        try:
+            self._temperature, self._humidity = self._read_data_with_crc()
+            self._valid = True
+        except:
+            self._valid = False
+            raise
+
     @property
     def mode(self):
         for this_mode in SHT4x.VALID_MODES:
@@ -154,7 +174,7 @@ class SHT4x:
 
         temperature = None
         if self._temperature != None:
-            temperature = round(-45.0 + 175.0 * self._temperature / 65535.0, 1)
+            temperature = round(TEMPERATURE_OFFSET + TEMPERATURE_SCALE * self._temperature, 1)
         return temperature
 
     @property
@@ -168,20 +188,9 @@ class SHT4x:
 
         humidity = None
         if self._humidity != None:
-            humidity = -6.0 + 125.0 * self._humidity / 65535.0
+            humidity = SHT4X_HUMIDITY_OFFSET + SHT4X_HUMIDITY_SCALE * self._humidity
             humidity = round(humidity, 1)
             humidity = max(min(humidity, 100.0), 0.0)
         return humidity
 
-    @staticmethod
-    def _calculate_crc8(data):
-        CRC8_POLYNOMIAL = 0x31
-        crc = 0xFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = (crc << 1) ^ CRC8_POLYNOMIAL
-                else:
-                    crc <<= 1
-        return crc & 0xFF
+    _calculate_crc8 = staticmethod(crc8)
@@ -0,0 +1,148 @@
+"""BMP180/BMP085 Driver."""
+
+import struct
+import time
+from collections import namedtuple
+from smbus2 import SMBus
+
+I2C_ADDRESS = 0x77
+DEFAULT_QNH = 1013.25  # Standard sea level pressure, hPa
+DEFAULT_TEMPERATURE_INTERVAL = 1.0  # Seconds a temperature conversion is reused for
+
+REG_CALIBRATION = 0xAA
+REG_CONTROL = 0xF4
+REG_DATA = 0xF6  # out_msb, out_lsb, out_xlsb
+CMD_TEMPERATURE = 0x2E
+CMD_PRESSURE = 0x34
+# AC1, AC2, AC3, AC4, AC5, AC6, B1, B2, MB, MC, MD: big endian, AC4..AC6 unsigned
+CALIBRATION = struct.Struct(">hhhHHHhhhhh")
+
+# Oversampling modes (oss) and their maximum conversion times in seconds (datasheet table 3)
+ULTRA_LOW_POWER = 0
+STANDARD = 1
+HIGH_RESOLUTION = 2
+ULTRA_HIGH_RESOLUTION = 3
+MODES = {
+    "ultra-low-power": ULTRA_LOW_POWER,
+    "standard": STANDARD,
+    "high-resolution": HIGH_RESOLUTION,
+    "ultra-high-resolution": ULTRA_HIGH_RESOLUTION,
+}
+PRESSURE_CONVERSION_TIMES = (0.0045, 0.0075, 0.0135, 0.0255)
+TEMPERATURE_CONVERSION_TIME = 0.0045
+
+# One compensated measurement: temperature in °C, pressure in hPa, altitude in m for the given QNH
+BMP180Sample = namedtuple("BMP180Sample", ["temperature", "pressure", "altitude"])
+
+
+class BMP180:
+    """
+    BMP180 (and BMP085) barometer.
+
+    The 11 calibration words are read once, with one block read. Pressure
+    compensation needs a recent temperature conversion; it is reused for
+    temperature_interval seconds (the datasheet considers one temperature
+    measurement per second sufficient), so most readings cost a single pressure
+    conversion. start_measurement() and read_measurement() split a reading
+    around the conversion delay; read_all() does both.
+    """
+
+    def __init__(self, i2c_dev=None, i2c_addr=I2C_ADDRESS, mode=STANDARD, qnh=DEFAULT_QNH,
+                 temperature_interval=DEFAULT_TEMPERATURE_INTERVAL, clock=time.monotonic):
+        if mode not in MODES.values():
+            raise ValueError(f"Invalid BMP180 mode: {mode}")
+        self._i2c_dev = i2c_dev if i2c_dev is not None else SMBus(1)
+        self._i2c_addr = i2c_addr
+        self.mode = mode
+        self.qnh = qnh
+        self.temperature_interval = temperature_interval
+        self._clock = clock
+        self._b5 = None
+        self._temperature_time = None
+        self.temperature = None
+        self.pressure = None
+        (self.ac1, self.ac2, self.ac3, self.ac4, self.ac5, self.ac6,
+         self.b1, self.b2, self.mb, self.mc, self.md) = CALIBRATION.unpack(bytes(
+            self._i2c_dev.read_i2c_block_data(self._i2c_addr, REG_CALIBRATION, CALIBRATION.size)
+        ))
+
+    @property
+    def conversion_time(self):
+        """Maximum pressure conversion time in seconds of the current mode."""
+        return PRESSURE_CONVERSION_TIMES[self.mode]
+
+    def start_measurement(self):
+        """
+        Start a pressure conversion without waiting for it.
+
+        A temperature conversion is done first (waiting its 4.5 ms) when the last
+        one is older than temperature_interval.
+
+        :return: Seconds until the pressure can be read
+        """
+
+        if self._temperature_time is None or self._clock() - self._temperature_time >= self.temperature_interval:
+            self.update_temperature()
+        self._i2c_dev.write_byte_data(self._i2c_addr, REG_CONTROL, CMD_PRESSURE + (self.mode << 6))
+        return self.conversion_time
+
+    def read_measurement(self, qnh=None):
+        """
+        Read the pressure converted after start_measurement().
+
+        :param qnh: Sea level pressure in hPa for the altitude, defaults to self.qnh
+        :return: BMP180Sample
+        """
+
+        msb, lsb, xlsb = self._i2c_dev.read_i2c_block_data(self._i2c_addr, REG_DATA, 3)
+        self.pressure = self.compensate_pressure(((msb << 16) | (lsb << 8) | xlsb) >> (8 - self.mode)) / 100.0
+        altitude = self.altitude(self.pressure, self.qnh if qnh is None else qnh)
+        return BMP180Sample(self.temperature, self.pressure, altitude)
+
+    def read_all(self, qnh=None):
+        """Start a measurement, wait for it and return the BMP180Sample."""
+        time.sleep(self.start_measurement())
+        return self.read_measurement(qnh)
+
+    def update_temperature(self):
+        """Run a temperature conversion now and return the temperature in °C."""
+        self._i2c_dev.write_byte_data(self._i2c_addr, REG_CONTROL, CMD_TEMPERATURE)
+        time.sleep(TEMPERATURE_CONVERSION_TIME)
+        msb, lsb = self._i2c_dev.read_i2c_block_data(self._i2c_addr, REG_DATA, 2)
+        self._temperature_time = self._clock()
+        self.temperature = self.compensate_temperature((msb << 8) | lsb)
+        return self.temperature
+
+    # Integer compensation of datasheet section 3.5
+
+    def compensate_temperature(self, raw_temperature):
+        x1 = ((raw_temperature - self.ac6) * self.ac5) >> 15
+        x2 = (self.mc << 11) // (x1 + self.md)
+        self._b5 = x1 + x2
+        return ((self._b5 + 8) >> 4) / 10.0
+
+    def compensate_pressure(self, raw_pressure):
+        """Compensate a raw pressure with the last temperature; returns Pa."""
+        b6 = self._b5 - 4000
+        x1 = (self.b2 * ((b6 * b6) >> 12)) >> 11
+        x2 = (self.ac2 * b6) >> 11
+        x3 = x1 + x2
+        b3 = (((self.ac1 * 4 + x3) << self.mode) + 2) // 4
+        x1 = (self.ac3 * b6) >> 13
+        x2 = (self.b1 * ((b6 * b6) >> 12)) >> 16
+        x3 = ((x1 + x2) + 2) >> 2
+        b4 = (self.ac4 * (x3 + 32768)) >> 15
+        b7 = (raw_pressure - b3) * (50000 >> self.mode)
+        if b7 < 0x80000000:
+            pressure = (b7 * 2) // b4
+        else:
+            pressure = (b7 // b4) * 2
+        x1 = (pressure >> 8) * (pressure >> 8)
+        x1 = (x1 * 3038) >> 16
+        x2 = (-7357 * pressure) >> 16
+        return pressure + ((x1 + x2 + 3791) >> 4)
+
+    @staticmethod
+    def altitude(pressure, qnh=DEFAULT_QNH):
+        """Altitude in m of a pressure in hPa for the sea level pressure qnh in hPa (datasheet 3.6)."""
+        return 44330.0 * (1.0 - pow(pressure / qnh, 1.0 / 5.255))
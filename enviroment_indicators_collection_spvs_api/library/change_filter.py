@@ -0,0 +1,80 @@
+"""Deadband / change-only filtering of entity states with a heartbeat."""
+
+import time
+from collections import namedtuple
+
+DEFAULT_HEARTBEAT = 300.0
+
+Deadband = namedtuple("Deadband", ["absolute", "relative"])
+NO_DEADBAND = Deadband(0.0, 0.0)
+
+
+class ChangeFilter:
+    """
+    Decide whether a new state is worth sending to Home Assistant.
+
+    A numeric state is only published when it moved further from the last
+    published value than the entity's deadband, i.e. more than
+    max(absolute, relative * |last|). Non-numeric states are published on any
+    change. Regardless of the deadband, an entity is re-published once it has
+    been silent for `heartbeat` seconds so it never goes stale.
+    """
+
+    def __init__(self, deadbands=None, default=NO_DEADBAND, heartbeat=DEFAULT_HEARTBEAT, clock=time.monotonic):
+        self._deadbands = dict(deadbands or {})
+        self._default = default
+        self.heartbeat = heartbeat
+        self._clock = clock
+        self._last = {}
+        self.published_count = 0
+        self.suppressed_count = 0
+
+    def set_deadband(self, entity_id, absolute=0.0, relative=0.0):
+        self._deadbands[entity_id.lower()] = Deadband(absolute, relative)
+
+    def seed(self, states):
+        """
+        Prime the cache from Home Assistant's current states.
+
+        :param states: Iterable of HA state objects as returned by GET /api/states
+        :return: Number of entities seeded
+        """
+
+        now = self._clock()
+        seeded = 0
+        for state in states:
+            entity_id = state.get("entity_id")
+            if not entity_id or state.get("state") in (None, "unknown", "unavailable"):
+                continue
+            self._last[entity_id.lower()] = (_as_number(state["state"]), now)
+            seeded += 1
+        return seeded
+
+    def should_publish(self, entity_id, value):
+        entity_id = entity_id.lower()
+        last = self._last.get(entity_id)
+        if last is None:
+            return True
+        last_value, last_time = last
+        if self._clock() - last_time >= self.heartbeat or self._changed(entity_id, last_value, _as_number(value)):
+            return True
+        self.suppressed_count += 1
+        return False
+
+    def mark_published(self, entity_id, value):
+        """Record that value was acknowledged by Home Assistant."""
+        self._last[entity_id.lower()] = (_as_number(value), self._clock())
+        self.published_count += 1
+
+    def _changed(self, entity_id, last_value, value):
+        if not isinstance(value, float) or not isinstance(last_value, float):
+            return value != last_value
+        band = self._deadbands.get(entity_id, self._default)
+        return abs(value - last_value) > max(band.absolute, band.relative * abs(last_value))
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
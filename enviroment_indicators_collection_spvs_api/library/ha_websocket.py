@@ -0,0 +1,192 @@
+"""Persistent WebSocket transport to the Home Assistant WebSocket API."""
+
+import asyncio
+import concurrent.futures
+import json
+import random
+import threading
+import time
+import websockets
+
+DEFAULT_EVENT_TYPE = "enviroment_sensor_state"
+DEFAULT_TIMEOUT = 5.0
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+class HAWebSocketError(ConnectionError):
+    """Raised when a state update could not be delivered over the WebSocket."""
+
+
+class HAWebSocketTransport:
+    """
+    One authenticated, long-lived connection to Home Assistant's /api/websocket.
+
+    The WebSocket API has no command that writes an entity state, so every update
+    is sent as a `fire_event` of event_type whose data holds entity_id, state and
+    attributes; trigger-based template sensors turn those events into entities.
+
+    post_state() has the same contract as HATransport.post_state and may be called
+    from several threads at once. Each call is written to the socket immediately
+    with its own message id and matched to its result, so concurrent updates are
+    pipelined over the single connection. A background thread owns the connection
+    and reconnects and re-authenticates with exponential backoff and jitter
+    whenever it drops.
+    """
+
+    def __init__(self, url, token, event_type=DEFAULT_EVENT_TYPE, timeout=DEFAULT_TIMEOUT):
+        self.url = url
+        self.event_type = event_type
+        self.timeout = timeout
+        self._token = token
+
+        self.request_count = 0
+        self.error_count = 0
+        self.reconnect_count = 0
+        self.last_latency = None
+        self._stats_lock = threading.Lock()
+
+        self._websocket = None
+        self._pending = {}
+        self._next_id = 1
+        self._connected = asyncio.Event()
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._maintain())
+        self._thread = threading.Thread(target=self._run_loop, name="ha-websocket", daemon=True)
+        self._thread.start()
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def post_state(self, url, payload):
+        """
+        Send a state update for the entity at the end of url.
+
+        :param url: Entity URL as used by the REST transport; only the entity id is used
+        :param payload: State dictionary with "state" and "attributes"
+        :return: Round-trip latency in seconds
+        :raises HAWebSocketError: If not connected, on timeout or when HA rejects the update
+        """
+
+        message = {
+            "type": "fire_event",
+            "event_type": self.event_type,
+            "event_data": {"entity_id": url.rsplit("/", 1)[-1], **payload},
+        }
+        start = time.monotonic()
+        try:
+            if self._loop.is_closed():
+                raise HAWebSocketError("WebSocket transport closed")
+            asyncio.run_coroutine_threadsafe(
+                asyncio.wait_for(self._send(message), self.timeout), self._loop
+            ).result()
+        except asyncio.TimeoutError:
+            self._record_error()
+            raise HAWebSocketError("Timed out waiting for Home Assistant") from None
+        except concurrent.futures.CancelledError:
+            self._record_error()
+            raise HAWebSocketError("WebSocket transport closed") from None
+        except HAWebSocketError:
+            self._record_error()
+            raise
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            self._record_error()
+            raise HAWebSocketError(str(e)) from e
+        latency = time.monotonic() - start
+        with self._stats_lock:
+            self.request_count += 1
+            self.last_latency = latency
+        return latency
+
+    def post_reading(self, reading):
+        """Send a library.entities.Reading; same contract as post_state."""
+        return self.post_state(reading.entity.url, reading.entity.payload(reading.state, reading.summary))
+
+    def _record_error(self):
+        with self._stats_lock:
+            self.error_count += 1
+
+    async def _send(self, message):
+        await self._connected.wait()
+        message_id = self._next_id
+        self._next_id += 1
+        message["id"] = message_id
+        future = self._loop.create_future()
+        self._pending[message_id] = future
+        try:
+            await self._websocket.send(json.dumps(message))
+            await future
+        finally:
+            self._pending.pop(message_id, None)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Updates still in flight are cancelled, so their post_state() calls return
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    async def _maintain(self):
+        backoff = MIN_BACKOFF
+        while True:
+            try:
+                websocket = await asyncio.wait_for(websockets.connect(self.url), self.timeout)
+                try:
+                    await self._authenticate(websocket)
+                    self._websocket = websocket
+                    self._connected.set()
+                    backoff = MIN_BACKOFF
+                    print(f"Connected to Home Assistant WebSocket API at {self.url}")
+                    async for message in websocket:
+                        self._dispatch(json.loads(message))
+                finally:
+                    self._connected.clear()
+                    self._websocket = None
+                    self._fail_pending(HAWebSocketError("WebSocket connection to Home Assistant lost"))
+                    await websocket.close()
+            except (OSError, asyncio.TimeoutError, ValueError, websockets.exceptions.WebSocketException) as e:
+                print(f"WebSocket connection to Home Assistant failed: {e}")
+            self.reconnect_count += 1
+            await asyncio.sleep(backoff / 2 + random.uniform(0, backoff / 2))
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    async def _authenticate(self, websocket):
+        message = json.loads(await asyncio.wait_for(websocket.recv(), self.timeout))
+        if message.get("type") != "auth_required":
+            raise HAWebSocketError(f"Unexpected message from Home Assistant: {message}")
+        await websocket.send(json.dumps({"type": "auth", "access_token": self._token}))
+        message = json.loads(await asyncio.wait_for(websocket.recv(), self.timeout))
+        if message.get("type") != "auth_ok":
+            raise HAWebSocketError(f"Authentication failed: {message.get('message', message)}")
+
+    def _dispatch(self, message):
+        if message.get("type") != "result":
+            return
+        future = self._pending.get(message.get("id"))
+        if future is None or future.done():
+            return
+        if message.get("success"):
+            future.set_result(message.get("result"))
+        else:
+            error = message.get("error", {})
+            future.set_exception(HAWebSocketError(f"{error.get('code')}: {error.get('message')}"))
+
+    def _fail_pending(self, error):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    def close(self):
+        """Close the connection, failing updates still waiting for a result, and stop the background thread."""
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join(self.timeout)
@@ -0,0 +1,96 @@
+"""CRC-8 and data frame decoding shared by the Sensirion SHT3x and SHT4x drivers."""
+
+import ctypes
+from smbus2 import i2c_msg
+from .i2c_bus import NACK_ERRNOS
+
+CRC8_POLYNOMIAL = 0x31
+CRC8_INIT = 0xFF
+FRAME_LENGTH = 6  # two 16-bit words, each followed by its CRC-8
+
+# Raw 16-bit word to physical value: value = offset + scale * raw (datasheet conversion formulas)
+TEMPERATURE_SCALE = 175.0 / 65535.0
+TEMPERATURE_OFFSET = -45.0
+SHT3X_HUMIDITY_SCALE = 100.0 / 65535.0
+SHT4X_HUMIDITY_SCALE = 125.0 / 65535.0
+SHT4X_HUMIDITY_OFFSET = -6.0
+
+
+def _crc8_table():
+    table = bytearray(256)
+    for index in range(256):
+        crc = index
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC8_POLYNOMIAL if crc & 0x80 else crc << 1) & 0xFF
+        table[index] = crc
+    return bytes(table)
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data):
+    """Sensirion CRC-8 (polynomial 0x31, init 0xFF) of data, one table lookup per byte."""
+    crc = CRC8_INIT
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+class FrameReader:
+    """
+    Reusable read of one data frame from a sensor.
+
+    The i2c_msg reads straight into a ctypes byte array allocated once, and
+    read() decodes and checks the two words from that array, without copying
+    the message into a list or slicing it.
+    """
+
+    def __init__(self, address, length=FRAME_LENGTH):
+        self.buffer = (ctypes.c_uint8 * length)()
+        self.message = i2c_msg.read(address, length)
+        self.message.buf = ctypes.cast(self.buffer, ctypes.POINTER(ctypes.c_char))
+
+    def read(self, bus):
+        """
+        Read a frame with bus.i2c_rdwr() and return its two raw words.
+
+        :raises ValueError: If the CRC8 check fails
+        """
+
+        bus.i2c_rdwr(self.message)
+        return decode_frame(self.buffer)
+
+    def poll(self, bus):
+        """
+        Like read(), but return None when the sensor NACKs because it has no new data.
+        Uses bus.poll() where available (library.i2c_bus.I2CBus), so the NACK is not a bus failure.
+
+        :raises ValueError: If the CRC8 check fails
+        """
+
+        if hasattr(bus, "poll"):
+            if not bus.poll(self.message):
+                return None
+        else:
+            try:
+                bus.i2c_rdwr(self.message)
+            except OSError as e:
+                if e.errno in NACK_ERRNOS:
+                    return None
+                raise
+        return decode_frame(self.buffer)
+
+
+def decode_frame(frame):
+    """
+    Return the two raw words of a 6-byte word/CRC frame (any indexable of ints).
+
+    :raises ValueError: If the CRC8 check fails
+    """
+
+    table = CRC8_TABLE
+    if (table[table[CRC8_INIT ^ frame[0]] ^ frame[1]] != frame[2]
+            or table[table[CRC8_INIT ^ frame[3]] ^ frame[4]] != frame[5]):
+        raise ValueError("CRC8 check failed")
+    return frame[0] << 8 | frame[1], frame[3] << 8 | frame[4]
@@ -0,0 +1,136 @@
+"""Per-sensor hard deadlines for blocking driver calls."""
+
+import asyncio
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .measurement import MeasurementTimeout, measure_async
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_LATENCY_WINDOW = 512
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class SensorWatchdog:
+    """
+    Run the blocking calls of one sensor on its own worker thread under a hard deadline.
+
+    Every bus call gives up after timeout seconds and raises MeasurementTimeout (a
+    TimeoutError); the waits of a measurement run on the event loop and do not
+    count towards it. A thread blocked in a driver call cannot be interrupted, so
+    it is abandoned: the sensor gets a fresh worker, and ready() stays false until
+    the abandoned call returns, so at most one thread per sensor is ever stuck and
+    the driver is never entered twice at once. Sensors do not share workers, so a hung
+    sensor cannot hold back the others. stats() gives the timeout count and the
+    latency percentiles of the last window measurements, timed-out ones
+    included (all times in seconds).
+    """
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, window=DEFAULT_LATENCY_WINDOW, clock=time.monotonic):
+        self.name = name
+        self.timeout = timeout
+        self._clock = clock
+        self._executor = self._new_executor()
+        self._latencies = deque(maxlen=window)
+        self._active = None
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+    def _new_executor(self):
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"i2c-{self.name}")
+
+    def ready(self):
+        """False while a call abandoned after a timeout is still blocked in the driver."""
+        return self._active is None
+
+    async def measure(self, measurement):
+        """
+        library.measurement.measure_async() with every bus call under the deadline.
+
+        :return: The values returned by collect(), or None on failure
+        :raises MeasurementTimeout: If a bus call did not finish within timeout
+        """
+
+        start = self._clock()
+        try:
+            values = await measure_async(measurement, self.call)
+        except MeasurementTimeout:
+            # A timed-out reading is the slowest of all: leaving it out would hide a hanging sensor from the tail
+            self._latencies.append(self._clock() - start)
+            raise
+        self.runs += 1
+        self._latencies.append(self._clock() - start)
+        if values is None:
+            self.failures += 1
+        return values
+
+    async def call(self, func, *args):
+        """Run func(*args) on the sensor's worker; raises MeasurementTimeout after timeout."""
+        loop = asyncio.get_running_loop()
+        return await self._deadline(loop.run_in_executor(self._executor, self._guard(func), *args))
+
+    async def _deadline(self, awaitable):
+        # Not asyncio.wait_for(): it returns the result instead of raising when it is cancelled just as the
+        # call completes (before Python 3.12), and the job would then keep running after the scheduler stopped
+        task = asyncio.ensure_future(awaitable)
+        try:
+            done, _ = await asyncio.wait((task,), timeout=self.timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            task.cancel()
+            self.timeouts += 1
+            self._recycle()
+            raise MeasurementTimeout(f"{self.name} did not answer within {self.timeout:g} s")
+        return task.result()
+
+    def _recycle(self):
+        # The blocked thread cannot be stopped: let it finish on its own and give the sensor a new worker
+        if self._active is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self.recycled += 1
+
+    def _guard(self, func):
+        def call(*args):
+            self._active = func
+            try:
+                return func(*args)
+            finally:
+                self._active = None
+        return call
+
+    def percentiles(self):
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {q: None for q in PERCENTILES}
+        return {q: latencies[max(0, math.ceil(q * len(latencies)) - 1)] for q in PERCENTILES}
+
+    def stats(self):
+        percentiles = self.percentiles()
+        return {
+            "timeout": self.timeout,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "stuck": not self.ready(),
+            **{f"p{round(q * 100)}_latency": latency for q, latency in percentiles.items()},
+        }
+
+    def format_stats(self):
+        p50, p95, p99 = self.percentiles().values()
+        return (f"Watchdog: {self.name} {self.runs} runs, {self.failures} failures, {self.timeouts} timeouts "
+                f"(limit {self.timeout:g} s), {self.recycled} workers recycled, "
+                f"latency p50 {_ms(p50)}, p95 {_ms(p95)}, p99 {_ms(p99)}" + (", stuck" if not self.ready() else ""))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ms(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f} ms"
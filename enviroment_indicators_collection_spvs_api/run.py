@@ -1,16 +1,63 @@
 import os
+import asyncio
 import time
+from functools import partial
 import math
 import json
+import signal
 import requests
-from library.bmp280_driver import BMP280
-from smbus2 import SMBus
-from Adafruit_BMP.BMP085 import BMP085
+from library.bmp280_driver import BMP280, PROFILES, measurement_time
+from library.bmp180_driver import BMP180, MODES as BMP180_MODES, PRESSURE_CONVERSION_TIMES
 from library.DFRobot_Oxygen import DFRobot_Oxygen_IIC
 from library.SHT4x import SHT4x
+from library.SHT3x import SHT3x
+from library.ha_transport import HATransport, is_endpoint_failure
+from library.change_filter import ChangeFilter
+from library.outbox import Outbox, OutboxDrainer
+from library.sample_buffer import SampleBuffer, AsyncPublishWorker
+from library.ha_websocket import HAWebSocketTransport
+from library.ha_mqtt import HAMqttTransport
+from library.entities import UNAVAILABLE, Reading, compile_entity, compile_registry
+from library.circuit_breaker import CLOSED, CircuitBreaker
+from library.aggregation import WindowAggregator
+from library.scheduler import DeadlineScheduler
+from library.measurement import Measurement
+from library.watchdog import SensorWatchdog
+from library.i2c_bus import I2CBusManager
 
 
 class SensorManager:
+    # Entity của từng cảm biến: (object_id, đơn vị, tên hiển thị, ngưỡng thay đổi mặc định)
+    ENTITIES = {
+        "bmp180": (
+            ("bmp180_pressure", "hPa", "BMP180 Pressure", 0.05),
+            ("bmp180_altitude", "m", "BMP180 Altitude", 0.5),
+        ),
+        "bmp280": (
+            ("bmp280_temperature", "°C", "BMP280 Temperature", 0.05),
+            ("bmp280_pressure", "hPa", "BMP280 Pressure", 0.05),
+            ("bmp280_altitude", "m", "BMP280 Altitude", 0.5),
+        ),
+        "sht31": (
+            ("sht31_temperature", "°C", "SHT31 Temperature", 0.05),
+            ("sht31_humidity", "%", "SHT31 Humidity", 0.2),
+            ("sht31_absolute_humidity", "g/m³", "SHT31 Absolute Humidity", 0.05),
+            ("sht31_dew_point", "°C", "SHT31 Dew Point", 0.1),
+        ),
+        "sht45": (
+            ("sht45_temperature", "°C", "SHT45 Temperature", 0.05),
+            ("sht45_humidity", "%", "SHT45 Humidity", 0.2),
+            ("sht45_absolute_humidity", "g/m³", "SHT45 Absolute Humidity", 0.05),
+            ("sht45_dew_point", "°C", "SHT45 Dew Point", 0.1),
+        ),
+        "oxygen": (
+            ("oxygen_concentration", "%", "Oxygen Concentration", 0.05),
+        ),
+    }
+    SHT45_MODE = "high"
+    SHT45_CONVERSION_TIME = SHT4x.VALID_MODES[SHT45_MODE][1]
+    SHT31_REPEATABILITY = "high"
+
     def __init__(self, options_path="/data/options.json"):
         # Đọc các tùy chọn từ file options.json
         self.options = self.load_options(options_path)
@@ -26,32 +73,192 @@ class SensorManager:
             "Authorization": f"Bearer {self.ha_token}",
             "Content-Type": "application/json",
         }
+        # Kết nối HTTP dùng chung (keep-alive, có timeout) tới Home Assistant
+        self.transport = HATransport(
+            self.headers,
+            pool_size=int(self.options.get("http_pool_size", 4)),
+            connect_timeout=float(self.options.get("http_connect_timeout", 3.05)),
+            read_timeout=float(self.options.get("http_read_timeout", 5.0)),
+        )
+        # Kênh gửi trạng thái: REST (mặc định), một kết nối WebSocket lâu dài hoặc MQTT
+        transport = self.options.get("transport", "rest")
+        self.publish_transport = self.transport
+        if transport == "websocket":
+            self.publish_transport = HAWebSocketTransport(
+                "ws://supervisor/core/websocket",
+                self.ha_token,
+                event_type=self.options.get("websocket_event_type", "enviroment_sensor_state"),
+            )
+        elif transport == "mqtt":
+            broker = self.mqtt_broker()
+            self.publish_transport = HAMqttTransport(
+                broker["host"],
+                port=int(broker.get("port", 1883)),
+                username=broker.get("username"),
+                password=broker.get("password"),
+                node_id=self.options.get("mqtt_node_id", "enviroment"),
+                qos=int(self.options.get("mqtt_qos", 1)),
+                max_inflight=int(self.options.get("mqtt_max_inflight", 20)),
+            )
+        # Ngắt mạch khi Home Assistant không phản hồi: lỗi ngay thay vì chờ timeout cho từng entity
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(self.options.get("breaker_failure_threshold", 3)),
+            reset_timeout=float(self.options.get("breaker_reset_timeout", 10)),
+            max_reset_timeout=float(self.options.get("breaker_max_reset_timeout", 300)),
+            is_failure=is_endpoint_failure,
+        )
+        self.post_reading = self.breaker.wrap(self.publish_transport.post_reading)
+        self.circuit_entity = compile_entity(f"{self.ha_base_url}/states", "enviroment_publisher_circuit", None,
+                                             "Publisher Circuit", self.headers)
+        # Bộ đếm chuyển trạng thái lúc khởi động: chỉ gửi entity sau một lần mở/đóng mạch thật sự
+        self.reported_circuit = (0, 0, 0)
+
+        # SHT31: đo single shot mỗi lần đọc (chờ đúng thời gian đo theo độ lặp lại),
+        # hoặc đo liên tục sht31_mps lần/giây và chỉ lấy kết quả, không phải chờ
+        self.sht31_mps = float(self.options["sht31_mps"]) if self.options.get("sht31_mps") else None
+        sht31_conversion_time = 0.0 if self.sht31_mps else SHT3x.SINGLE_SHOT[self.SHT31_REPEATABILITY][1]
+
+        # BMP180: nhiệt độ được đo lại tối đa mỗi bmp180_temperature_interval giây, mỗi lần đọc chỉ chờ đo áp suất
+        self.bmp180_mode = BMP180_MODES[self.options.get("bmp180_mode", "standard")]
+        bmp180_conversion_time = PRESSURE_CONVERSION_TIMES[self.bmp180_mode]
+
+        # BMP280 ở chế độ forced: đo một lần mỗi chu kỳ theo profile, chờ đúng thời gian đo tối đa của datasheet
+        self.bmp280_profile = self.options.get("bmp280_profile", "standard")
+        bmp280_conversion_time = measurement_time(*PROFILES[self.bmp280_profile][:2])
+
+        # Oxy: đọc liên tiếp oxygen_burst_size lần, cách nhau oxygen_burst_interval ms, trong cùng một chu kỳ
+        # (bỏ giá trị ngoại lai), thay cho trung bình trượt 20 lần đọc; thêm entity độ phân tán
+        self.oxygen_burst_size = int(self.options.get("oxygen_burst_size", 0))
+        self.oxygen_burst_interval = float(self.options.get("oxygen_burst_interval", 20)) / 1000.0
+        entities = dict(self.ENTITIES)
+        if self.oxygen_burst_size:
+            entities["oxygen"] = self.ENTITIES["oxygen"] + (("oxygen_spread", "%", "Oxygen Spread", 0.05),)
+            oxygen_measurement = Measurement("oxygen", None, self.read_oxygen_sample, 0.0, self.oxygen_burst_size,
+                                             self.oxygen_burst_interval, self.combine_oxygen_burst)
+        else:
+            oxygen_measurement = Measurement("oxygen", None, self.read_oxygen, 0.0)
+
+        # Biên dịch một lần danh sách entity của các cảm biến được bật (URL, headers, mẫu JSON)
+        self.sensors = compile_registry(
+            self.options,
+            entities,
+            {
+                "bmp180": Measurement("bmp180", self.start_bmp180, self.read_bmp180, bmp180_conversion_time),
+                "bmp280": Measurement("bmp280", self.start_bmp280, self.read_bmp280, bmp280_conversion_time),
+                "sht31": Measurement("sht31", self.start_sht31, self.read_sht31_values, sht31_conversion_time),
+                "sht45": Measurement("sht45", self.start_sht45, self.read_sht45_values, self.SHT45_CONVERSION_TIME),
+                # Oxy: key chỉ đọc (và chờ 100 ms) ở lần đầu và sau khi hiệu chuẩn, các lần sau chỉ một lần đọc
+                "oxygen": oxygen_measurement,
+            },
+            f"{self.ha_base_url}/states",
+            self.headers,
+        )
+        self.entities = {entity.entity_id: entity for sensor in self.sensors for entity in sensor.entities}
 
-        # Khởi tạo bus I2C
-        self.bus = SMBus(5)  # Điều chỉnh bus I2C nếu cần thiết
+        # Chỉ gửi khi giá trị thay đổi vượt ngưỡng hoặc đến hạn heartbeat
+        self.change_filter = None
+        if self.options.get("change_only", True):
+            self.change_filter = self.build_change_filter()
+            self.seed_change_filter()
+
+        # Lưu tạm dữ liệu chưa gửi được vào /data và gửi lại khi Home Assistant hoạt động trở lại
+        self.outbox = None
+        if self.options.get("outbox", True):
+            self.outbox = Outbox(
+                max_segments=max(2, int(self.options.get("outbox_max_size", 2048)) * 1024 // (64 * 1024)),
+            )
+            self.outbox_drainer = OutboxDrainer(
+                self.outbox,
+                self.breaker.wrap(self.publish_transport.post_state),
+                rate=float(self.options.get("outbox_drain_rate", 5.0)),
+            )
+            self.outbox_drainer.start()
+
+        # Tách việc đọc cảm biến khỏi việc gửi dữ liệu: bộ đệm vòng + task publisher trên cùng event loop
+        self.buffer = SampleBuffer(
+            capacity=int(self.options.get("buffer_capacity", 64)),
+            policy=self.options.get("buffer_overflow", "coalesce"),
+        )
+        self.publish_worker = AsyncPublishWorker(self.buffer, self.publish)
+
+        # Lấy mẫu mỗi sample_interval giây; nếu publish_interval dài hơn thì chỉ gửi giá trị tổng hợp của cả cửa sổ
+        self.sample_interval = float(self.options.get("sample_interval", 10))
+        self.publish_interval = float(self.options.get("publish_interval", self.sample_interval))
+        self.aggregator = None
+        if self.publish_interval > self.sample_interval:
+            self.aggregator = WindowAggregator()
+        # Chu kỳ và độ lệch pha riêng của từng cảm biến (mặc định: sample_interval, không lệch pha)
+        self.schedule = {sensor.name: (self.sample_interval, 0.0) for sensor in self.sensors}
+        # Mỗi lần gọi bus khi đọc một cảm biến phải xong trong sensor_timeout giây (có thể đặt riêng từng cảm biến)
+        timeouts = {sensor.name: float(self.options.get("sensor_timeout", 2.0)) for sensor in self.sensors}
+        for entry in self.options.get("sensor_intervals", []):
+            if entry["sensor"] in self.schedule:
+                self.schedule[entry["sensor"]] = (float(entry["interval"]), float(entry.get("phase", 0.0)))
+                timeouts[entry["sensor"]] = float(entry.get("timeout", timeouts[entry["sensor"]]))
+        # Mỗi cảm biến là một task asyncio với luồng I2C riêng, có watchdog: cảm biến bị treo bị bỏ qua
+        # (luồng được thay mới) và báo unavailable, không làm chậm các cảm biến khác và việc gửi dữ liệu.
+        # Thời gian chuyển đổi và khoảng chờ giữa các lần đọc burst được chờ bằng asyncio.sleep, ngoài timeout
+        self.watchdogs = {name: SensorWatchdog(name, timeout) for name, timeout in timeouts.items()}
+
+        # Mở bus I2C một lần và dùng chung (có khóa) cho tất cả các driver
+        self.i2c = I2CBusManager()
+        self.bus = self.i2c.get(int(self.options.get("i2c_bus", 5)))
+        # Địa chỉ I2C của từng cảm biến, để bỏ qua cảm biến đang lỗi (degraded) cho tới khi dò lại thành công
+        self.device_addresses = {}
+
+        # Áp suất mực nước biển (hPa) dùng để tính độ cao từ áp suất
+        self.qnh = float(self.options.get("qnh", 1013.25))
 
         # Khởi tạo các cảm biến nếu chúng được bật trong cấu hình
         if self.options.get("bmp180", False):
-            self.bmp180 = BMP085(busnum=5)  # BMP180
+            self.bmp180 = BMP180(
+                self.bus,
+                mode=self.bmp180_mode,
+                qnh=self.qnh,
+                temperature_interval=float(self.options.get("bmp180_temperature_interval", 1.0)),
+            )
+            self.add_device("bmp180", 0x77)
 
         if self.options.get("bmp280", False):
-            self.bmp280 = BMP280(i2c_addr=0x76, i2c_dev=self.bus)
-            self.bmp280.setup(
-                mode="normal",
-                temperature_oversampling=16,
-                pressure_oversampling=16,
-                temperature_standby=500
-            )
+            self.bmp280 = BMP280(i2c_addr=0x76, i2c_dev=self.bus, qnh=self.qnh)
+            self.bmp280.setup(mode="forced", profile=self.bmp280_profile)
+            self.add_device("bmp280", 0x76)
 
         if self.options.get("oxygen", False):
-            self.oxygen_sensor = DFRobot_Oxygen_IIC(5, 0x73)
+            ema_time_constant = self.options.get("oxygen_ema_time_constant")
+            self.oxygen_sensor = DFRobot_Oxygen_IIC(
+                self.bus, 0x73,
+                ema_time_constant=float(ema_time_constant) if ema_time_constant is not None else None
+            )
+            self.add_device("oxygen", 0x73)
 
         if self.options.get("sht31", False):
-            self.sht31_address = 0x44
-            self.read_temp_hum_cmd = [0x2C, 0x06]
+            self.sht31_sensor = SHT3x(bus=self.bus, address=0x44, repeatability=self.SHT31_REPEATABILITY,
+                                      mps=self.sht31_mps)
+            self.add_device("sht31", 0x44)
 
         if self.options.get("sht45", False):
-            self.sht45_sensor = SHT4x(bus=5, address=0x44, mode="high")
+            self.sht45_sensor = SHT4x(bus=self.bus, address=0x44, mode=self.SHT45_MODE)
+            self.add_device("sht45", 0x44)
+
+    def add_device(self, name, address):
+        self.bus.label(address, name)
+        self.device_addresses[name] = address
+
+    async def device_available(self, sensor):
+        # Bỏ qua cảm biến khi lần đọc bị watchdog bỏ dở vẫn còn treo trong driver.
+        # Chỉ dò lại (một lệnh quick write, trên luồng của cảm biến) khi cảm biến đang degraded và đã tới lúc dò
+        watchdog = self.watchdogs[sensor.name]
+        if not watchdog.ready():
+            return False
+        address = self.device_addresses[sensor.name]
+        if not self.bus.is_degraded(address):
+            return True
+        try:
+            return await watchdog.call(self.bus.available, address)
+        except TimeoutError as e:
+            print(f"Error probing {sensor.name.upper()}: {e}")
+            return False
 
     def load_options(self, file_path):
         try:
@@ -66,24 +273,96 @@ class SensorManager:
             print("Error: Supervisor token is missing.")
             exit(1)
 
-    def post_to_home_assistant(self, sensor_name, value, unit, friendly_name):
-        url = f"{self.ha_base_url}/states/sensor.{sensor_name}"
-        payload = {
-            "state": value,
-            "attributes": {
-                "unit_of_measurement": unit,
-                "friendly_name": friendly_name,
-            },
-        }
+    def mqtt_broker(self):
+        # Ưu tiên broker cấu hình thủ công, nếu không thì hỏi Supervisor (dịch vụ MQTT, ví dụ Mosquitto add-on)
+        if self.options.get("mqtt_host"):
+            return {
+                "host": self.options["mqtt_host"],
+                "port": self.options.get("mqtt_port", 1883),
+                "username": self.options.get("mqtt_username"),
+                "password": self.options.get("mqtt_password"),
+            }
+        try:
+            return self.transport.get_json("http://supervisor/services/mqtt")["data"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"Error: MQTT service is not available from Supervisor: {e}")
+            exit(1)
+
+    def build_change_filter(self):
+        change_filter = ChangeFilter(heartbeat=float(self.options.get("heartbeat_interval", 300)))
+        for entity in self.entities.values():
+            change_filter.set_deadband(entity.entity_id, absolute=entity.deadband)
+        for deadband in self.options.get("deadbands", []):
+            change_filter.set_deadband(
+                deadband["entity"],
+                absolute=float(deadband.get("absolute", 0.0)),
+                relative=float(deadband.get("relative", 0.0)),
+            )
+        return change_filter
+
+    def seed_change_filter(self):
+        # Lấy trạng thái hiện tại từ Home Assistant để không gửi lại mọi thứ sau khi khởi động lại
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
-            print(f"Data posted to {sensor_name}: {value}{unit}")
-        except requests.exceptions.RequestException as e:
-            print(f"Error posting to Home Assistant: {e}")
+            states = self.transport.get_states(f"{self.ha_base_url}/states")
+            seeded = self.change_filter.seed(
+                state for state in states if state.get("entity_id", "").lower() in self.entities
+            )
+            print(f"Seeded {seeded} entities from Home Assistant")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching states from Home Assistant: {e}")
+
+    async def publish(self, readings):
+        loop = asyncio.get_running_loop()
+        for reading in readings:
+            await self.publish_reading(loop, reading)
+        await loop.run_in_executor(None, self.report_circuit)
 
-    def calculate_altitude(self, pressure, sea_level_pressure=101325):
-        return 44330 * (1 - (pressure / sea_level_pressure) ** (1 / 5.255))
+    async def publish_reading(self, loop, reading):
+        entity = reading.entity
+        if self.change_filter is not None and not self.change_filter.should_publish(entity.entity_id, reading.state):
+            return
+        unit = entity.attributes["unit_of_measurement"]
+        if self.outbox is not None and self.outbox.pending:
+            # Outbox còn dữ liệu chờ gửi lại: xếp hàng phía sau để giữ đúng thứ tự
+            self.enqueue(reading)
+            print(f"Queued {entity.object_id}: {reading.state}{unit}, {self.outbox.pending} waiting in outbox")
+            return
+        try:
+            latency = await loop.run_in_executor(None, self.post_reading, reading)
+            self.mark_published(reading)
+            print(f"Data posted to {entity.object_id}: {reading.state}{unit} ({latency * 1000:.1f} ms)")
+        except Exception as e:
+            # Mọi lỗi (kết nối, bộ ngắt mạch, mã hóa...) chỉ ảnh hưởng giá trị này: lưu vào outbox để gửi lại
+            print(f"Error posting {entity.object_id} to Home Assistant: {e}")
+            if self.outbox is not None:
+                self.enqueue(reading)
+
+    def report_circuit(self):
+        # Gửi trạng thái bộ ngắt mạch (entity chẩn đoán) sau mỗi lần chuyển trạng thái,
+        # khi Home Assistant đã nhận lại dữ liệu (lúc mạch mở thì không thể gửi được)
+        stats = self.breaker.stats()
+        key = (stats["opened"], stats["half_opened"], stats["closed"])
+        if stats["state"] != CLOSED or key == self.reported_circuit:
+            return
+        payload = {"state": stats.pop("state"), "attributes": {**self.circuit_entity.attributes, **stats}}
+        try:
+            self.breaker.call(self.publish_transport.post_state, self.circuit_entity.url, payload)
+            self.reported_circuit = key
+        except Exception as e:
+            print(f"Error posting circuit state to Home Assistant: {e}")
+
+    def enqueue(self, reading):
+        entity = reading.entity
+        self.outbox.append({
+            "url": entity.url,
+            "payload": entity.payload(reading.state, reading.summary),
+            "ts": reading.timestamp,
+        })
+        self.mark_published(reading)
+
+    def mark_published(self, reading):
+        if self.change_filter is not None:
+            self.change_filter.mark_published(reading.entity.entity_id, reading.state)
 
     def calculate_absolute_humidity(self, temperature, relative_humidity):
         T = temperature
@@ -101,100 +380,147 @@ class SensorManager:
         dew_point = (243.5 * gamma) / (17.67 - gamma)
         return dew_point
 
+    def start_sht31(self):
+        self.sht31_sensor.start_measurement()
+
     def read_sht31(self):
-        try:
-            self.bus.write_i2c_block_data(self.sht31_address, self.read_temp_hum_cmd[0], self.read_temp_hum_cmd[1:])
-            time.sleep(0.5)
-            data = self.bus.read_i2c_block_data(self.sht31_address, 0x00, 6)
-            temp_raw = (data[0] << 8) + data[1]
-            humidity_raw = (data[3] << 8) + data[4]
-            temperature = -45 + (175 * temp_raw / 65535.0)
-            humidity = (100 * humidity_raw / 65535.0)
-            return temperature, humidity
-        except Exception as e:
-            print(f"Error reading SHT31: {e}")
-            return None, None
+        # Đọc kết quả (có kiểm tra CRC); ở chế độ periodic lấy kết quả mới nhất bằng lệnh 0xE000
+        self.sht31_sensor.read_measurement()
+        return self.sht31_sensor.temperature, self.sht31_sensor.humidity
+
+    def start_sht45(self):
+        self.sht45_sensor.start_measurement()
 
     def read_sht45(self):
-        try:
-            self.sht45_sensor.update()
-            temperature = self.sht45_sensor.temperature
-            humidity = self.sht45_sensor.humidity
-            return temperature, humidity
-        except Exception as e:
-            print(f"Error reading SHT45: {e}")
-            return None, None
+        self.sht45_sensor.read_measurement()
+        return self.sht45_sensor.temperature, self.sht45_sensor.humidity
+
+    def read_sht31_values(self):
+        return self.with_derived_humidity(*self.read_sht31())
+
+    def read_sht45_values(self):
+        return self.with_derived_humidity(*self.read_sht45())
+
+    def with_derived_humidity(self, temperature, humidity):
+        if temperature is None or humidity is None:
+            return None
+        return (
+            temperature,
+            humidity,
+            self.calculate_absolute_humidity(temperature, humidity),
+            self.calculate_dew_point(temperature, humidity),
+        )
+
+    def start_bmp180(self):
+        self.bmp180.start_measurement()
+
+    def read_bmp180(self):
+        # Áp suất (hPa) và độ cao từ cùng một lần đo
+        sample = self.bmp180.read_measurement()
+        return sample.pressure, sample.altitude
+
+    def start_bmp280(self):
+        self.bmp280.start_measurement()
+
+    def read_bmp280(self):
+        # Một lần đọc 6 byte: nhiệt độ, áp suất (hPa) và độ cao từ cùng một mẫu
+        sample = self.bmp280.read_measurement()
+        return sample.temperature, sample.pressure, sample.altitude
 
     def read_oxygen(self):
+        return (self.oxygen_sensor.get_oxygen_data(collect_num=20),)
+
+    def read_oxygen_sample(self):
+        # Một lần đọc của burst; khoảng chờ giữa các lần đọc nằm trên event loop, không chiếm luồng I2C
+        if self.oxygen_sensor.key is None:
+            self.oxygen_sensor.get_flash()
+        return self.oxygen_sensor.read_oxygen_sample()
+
+    def combine_oxygen_burst(self, samples):
+        return self.oxygen_sensor.combine_burst(samples)
+
+    async def read_sensor(self, sensor):
+        # Đo một cảm biến, mỗi giá trị đọc được ứng với một entity đã biên dịch sẵn
         try:
-            oxygen_concentration = self.oxygen_sensor.get_oxygen_data(collect_num=20)
-            return oxygen_concentration
-        except Exception as e:
-            print(f"Error reading Oxygen sensor: {e}")
-            return None
+            values = await self.watchdogs[sensor.name].measure(sensor.measurement)
+        except TimeoutError as e:
+            print(f"Error reading {sensor.name.upper()}: {e}")
+            self.report_unavailable(sensor)
+            return []
+        if values is None or None in values:
+            return []
+        return list(zip(sensor.entities, values))
+
+    async def sample(self, sensor):
+        timestamp = time.time()
+        return [
+            Reading(entity, round(value, entity.precision), timestamp) for entity, value in await self.read_sensor(sensor)
+        ]
+
+    def report_unavailable(self, sensor):
+        # Cảm biến không trả lời trước hạn: báo các entity của nó là unavailable cho Home Assistant
+        timestamp = time.time()
+        self.buffer.put_many((entity.entity_id, Reading(entity, UNAVAILABLE, timestamp)) for entity in sensor.entities)
+        self.publish_worker.notify()
+
+    async def sample_sensor(self, sensor):
+        if self.aggregator is not None:
+            self.aggregator.add_many(await self.read_sensor(sensor))
+            return
+        # Chuyển dữ liệu sang task publisher để gửi lên Home Assistant
+        self.buffer.put_many(((reading.entity.entity_id, reading) for reading in await self.sample(sensor)))
+        self.publish_worker.notify()
+
+    def flush_window(self):
+        # Hết cửa sổ: gửi giá trị tổng hợp (trung bình, min, max, last, số mẫu) của từng entity
+        readings = self.aggregator.flush(time.time())
+        self.buffer.put_many(((reading.entity.entity_id, reading) for reading in readings))
+        self.publish_worker.notify()
 
     def run(self):
-        while True:
-            # Đọc và gửi dữ liệu từ BMP180
-            if self.options.get("bmp180", False):
-                try:
-                    pressure = self.bmp180.read_pressure()
-                    self.post_to_home_assistant("bmp180_pressure", round(pressure / 100, 2), "hPa", "BMP180 Pressure")
-                    altitude = self.calculate_altitude(pressure)
-                    self.post_to_home_assistant("bmp180_altitude", round(altitude, 2), "m", "BMP180 Altitude")
-                except Exception as e:
-                    print(f"Error reading BMP180: {e}")
-
-            # Đọc và gửi dữ liệu từ BMP280
-            if self.options.get("bmp280", False):
-                try:
-                    temperature = self.bmp280.get_temperature()
-                    pressure = self.bmp280.get_pressure()
-                    self.post_to_home_assistant("bmp280_temperature", round(temperature, 2), "°C", "BMP280 Temperature")
-                    self.post_to_home_assistant("bmp280_pressure", round(pressure, 2), "hPa", "BMP280 Pressure")
-                    altitude = self.calculate_altitude(pressure)
-                    self.post_to_home_assistant("bmp280_altitude", round(altitude, 2), "m", "BMP280 Altitude")
-                except Exception as e:
-                    print(f"Error reading BMP280: {e}")
-
-            # Đọc và gửi dữ liệu từ SHT31
-            if self.options.get("sht31", False):
-                try:
-                    temperature, humidity = self.read_sht31()
-                    if temperature is not None and humidity is not None:
-                        self.post_to_home_assistant("sht31_temperature", round(temperature, 2), "°C", "SHT31 Temperature")
-                        self.post_to_home_assistant("sht31_humidity", round(humidity, 2), "%", "SHT31 Humidity")
-                        absolute_humidity = self.calculate_absolute_humidity(temperature, humidity)
-                        self.post_to_home_assistant("sht31_absolute_humidity", round(absolute_humidity, 2), "g/m³", "SHT31 Absolute Humidity")
-                        dew_point = self.calculate_dew_point(temperature, humidity)
-                        self.post_to_home_assistant("sht31_dew_point", round(dew_point, 2), "°C", "SHT31 Dew Point")
-                except Exception as e:
-                    print(f"Error reading SHT31: {e}")
-
-            # Đọc và gửi dữ liệu từ SHT45
-            if self.options.get("sht45", False):
-                try:
-                    temperature, humidity = self.read_sht45()
-                    if temperature is not None and humidity is not None:
-                        self.post_to_home_assistant("sht45_temperature", round(temperature, 2), "°C", "SHT45 Temperature")
-                        self.post_to_home_assistant("sht45_humidity", round(humidity, 2), "%", "SHT45 Humidity")
-                        absolute_humidity = self.calculate_absolute_humidity(temperature, humidity)
-                        self.post_to_home_assistant("sht45_absolute_humidity", round(absolute_humidity, 2), "g/m³", "SHT45 Absolute Humidity")
-                        dew_point = self.calculate_dew_point(temperature, humidity)
-                        self.post_to_home_assistant("sht45_dew_point", round(dew_point, 2), "°C", "SHT45 Dew Point")
-                except Exception as e:
-                    print(f"Error reading SHT45: {e}")
-
-            # Đọc và gửi dữ liệu từ cảm biến Oxy
-            if self.options.get("oxygen", False):
-                try:
-                    oxygen_concentration = self.read_oxygen()
-                    if oxygen_concentration is not None:
-                        self.post_to_home_assistant("oxygen_concentration", round(oxygen_concentration, 2), "%", "Oxygen Concentration")
-                except Exception as e:
-                    print(f"Error reading Oxygen sensor: {e}")
-
-            time.sleep(10)
+        asyncio.run(self.main())
+
+    async def main(self):
+        # Lập lịch theo hạn chót trên đồng hồ monotonic: chu kỳ không bị trôi theo thời gian đọc/gửi.
+        # Mỗi cảm biến chạy thành một task riêng trên cùng event loop với task publisher
+        self.scheduler = DeadlineScheduler()
+        for sensor in self.sensors:
+            interval, phase = self.schedule[sensor.name]
+            self.scheduler.add(sensor.name, interval, partial(self.sample_sensor, sensor), phase=phase,
+                               ready=partial(self.device_available, sensor))
+        if self.aggregator is not None:
+            self.scheduler.add("window", self.publish_interval, self.flush_window, phase=self.publish_interval)
+        self.scheduler.add("i2c-stats", 60, self.log_bus_stats, phase=60)
+        # Supervisor dừng add-on bằng SIGTERM: dừng lịch đọc rồi đóng outbox và các kết nối thay vì bị ngắt giữa chừng
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.scheduler.stop)
+        publish_task = asyncio.create_task(self.publish_worker.run(), name="publisher")
+        try:
+            await self.scheduler.run_async()
+        finally:
+            publish_task.cancel()
+            await asyncio.gather(publish_task, return_exceptions=True)
+            self.close()
+
+    def close(self):
+        # Dừng gửi lại, ghi outbox xuống đĩa; MQTT báo offline trước khi ngắt kết nối
+        if self.outbox is not None:
+            self.outbox_drainer.stop()
+            self.outbox_drainer.join(timeout=self.transport.timeout[1])
+            self.outbox.close()
+        if self.publish_transport is not self.transport:
+            self.publish_transport.close()
+        self.transport.close()
+        for watchdog in self.watchdogs.values():
+            watchdog.close()
+        self.i2c.close()
+
+    def log_bus_stats(self):
+        for bus in self.i2c.buses:
+            print(bus.format_stats())
+        for watchdog in self.watchdogs.values():
+            print(watchdog.format_stats())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from library.circuit_breaker import CircuitBreaker
+from library.entities import Reading, compile_entity
+from run import SensorManager
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.records = []
+
+    @property
+    def pending(self):
+        return len(self.records)
+
+    def append(self, record):
+        self.records.append(record)
+
+
+class FakeTransport:
+    def __init__(self, posted):
+        self.posted = posted
+
+    def post_state(self, url, payload):
+        self.posted.append(payload)
+
+
+def _manager(post_reading):
+    # Only the publishing state, without options.json, I2C or Home Assistant
+    manager = SensorManager.__new__(SensorManager)
+    manager.change_filter = None
+    manager.outbox = FakeOutbox()
+    manager.post_reading = post_reading
+    return manager
+
+
+def _readings(count):
+    return [
+        Reading(compile_entity("http://supervisor/core/api/states", f"sensor_{index}", "°C", "Sensor"), 20.0 + index, 0.0)
+        for index in range(count)
+    ]
+
+
+@pytest.mark.parametrize("error", [ConnectionError("refused"), ValueError("cannot encode"), TypeError("bad state")])
+def test_failed_reading_goes_to_outbox(error):
+    posted = []
+
+    def post_reading(reading):
+        if reading.state == 21.0:
+            raise error
+        if manager.outbox.pending:
+            raise AssertionError("posted ahead of the outbox")
+        posted.append(reading.state)
+        return 0.001
+
+    manager = _manager(post_reading)
+
+    async def publish():
+        loop = asyncio.get_running_loop()
+        for reading in _readings(3):
+            await manager.publish_reading(loop, reading)
+
+    asyncio.run(publish())
+    assert posted == [20.0]
+    # The failed reading and the one queued behind it are kept for replay, in order
+    assert [record["payload"]["state"] for record in manager.outbox.records] == [21.0, 22.0]
+
+
+def test_circuit_entity_is_posted_after_an_open_close_cycle():
+    posted = []
+    manager = _manager(None)
+    manager.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    manager.publish_transport = FakeTransport(posted)
+    manager.circuit_entity = compile_entity("http://supervisor/core/api/states", "enviroment_publisher_circuit", None,
+                                            "Publisher Circuit")
+    manager.reported_circuit = (0, 0, 0)
+
+    # Nothing to report at startup
+    manager.report_circuit()
+    assert posted == []
+
+    with pytest.raises(ConnectionError):
+        manager.breaker.call(_raise, ConnectionError("refused"))
+    manager.breaker.call(lambda: None)
+    manager.report_circuit()
+    manager.report_circuit()
+    assert [(payload["state"], payload["attributes"]["opened"], payload["attributes"]["closed"])
+            for payload in posted] == [("closed", 1, 1)]
+
+
+def _raise(error):
+    raise error